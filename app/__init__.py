@@ -9,8 +9,10 @@ from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 
+from app.session import RoutingSession, REPLICA_BIND
+
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 bcrypt = Bcrypt()
 
@@ -18,6 +20,10 @@ def create_app(config_name=None):
     """Application factory pattern"""
     app = Flask(__name__, template_folder='../templates', static_folder='../static')
     
+    # orjson-backed JSON that serializes dates and Decimals itself
+    from app.utils.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    
     # Load environment variables
     load_dotenv()
     
@@ -25,6 +31,58 @@ def create_app(config_name=None):
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///expense_tracker.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Optional read-only copy of the database for reporting and listing endpoints
+    if os.environ.get('DATABASE_REPLICA_URL'):
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: os.environ['DATABASE_REPLICA_URL']}
+    # Seconds between checks for category changes made by other processes
+    app.config['CATEGORY_CATALOG_CHECK_INTERVAL'] = float(os.environ.get('CATEGORY_CATALOG_CHECK_INTERVAL', 5))
+    # Seconds a user loaded for a session is reused without a database lookup
+    app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 30))
+    # Coalesce concurrent expense inserts into one commit per GROUP_COMMIT_WINDOW_MS
+    app.config['GROUP_COMMIT'] = os.environ.get('GROUP_COMMIT', '0') == '1'
+    app.config['GROUP_COMMIT_WINDOW_MS'] = float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 5))
+    app.config['GROUP_COMMIT_MAX_BATCH'] = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 256))
+    app.config['GROUP_COMMIT_TIMEOUT'] = float(os.environ.get('GROUP_COMMIT_TIMEOUT', 10))
+    # PDF exports render in this many worker processes (0 renders inline)
+    app.config['PDF_EXPORT_WORKERS'] = int(os.environ.get('PDF_EXPORT_WORKERS', 2))
+    app.config['PDF_EXPORT_DIR'] = os.environ.get('PDF_EXPORT_DIR')
+    # Seconds finished exports are kept on disk
+    app.config['PDF_EXPORT_RETENTION'] = int(os.environ.get('PDF_EXPORT_RETENTION', 86400))
+    
+    # bcrypt cost factor; existing hashes are upgraded on the next login
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # Threads hashing passwords, and how many more checks may wait for one
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+    
+    # Engine profile: 'production' enables SQLite WAL/pragmas and server pool tuning
+    app.config['DATABASE_PROFILE'] = os.environ.get('DATABASE_PROFILE', 'default')
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+    app.config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))
+    
+    # Per-request SQL timing: Server-Timing headers, slow-query log and /metrics
+    app.config['SQL_INSTRUMENTATION'] = os.environ.get('SQL_INSTRUMENTATION', '1') == '1'
+    # Statements slower than this are logged with their endpoint (0 disables the log)
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+    # /metrics is only served when this is set, to "Authorization: Bearer <token>"
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    # Let the listed usernames profile a request with "X-Profile: 1" or ?_profile=1
+    app.config['PROFILING'] = os.environ.get('PROFILING', '0') == '1'
+    app.config['PROFILING_ADMINS'] = {
+        name.strip() for name in os.environ.get('PROFILING_ADMINS', '').split(',') if name.strip()
+    }
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR')
+    # Newest profiles kept on disk, and how often the flamegraph sampler looks at the stack
+    app.config['PROFILE_MAX_FILES'] = int(os.environ.get('PROFILE_MAX_FILES', 50))
+    app.config['PROFILE_SAMPLE_INTERVAL_MS'] = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 1))
+    
+    from app.utils import database
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database.engine_options(app.config)
     
     # Initialize extensions with app
     db.init_app(app)
@@ -32,6 +90,13 @@ def create_app(config_name=None):
     bcrypt.init_app(app)
     CORS(app)
     
+    database.init_app(app)
+    from app.utils import passwords, group_commit, instrumentation, profiling
+    passwords.init_app(app)
+    group_commit.init_app(app)
+    instrumentation.init_app(app)
+    profiling.init_app(app)
+    
     # Login manager configuration
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
@@ -40,8 +105,8 @@ def create_app(config_name=None):
     # User loader callback
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models.user import User
-        return User.query.get(int(user_id))
+        from app.models.user_cache import load_user as load_cached_user
+        return load_cached_user(int(user_id))
     
     # Register blueprints
     from app.routes.auth import auth_bp
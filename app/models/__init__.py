@@ -2,6 +2,9 @@
 Models package initialization
 """
 from .user import User
-from .expense import Expense, Category
+from .expense import Expense, Category, ExpenseRollup
+from .version import DataVersion
+from . import search  # registers the full-text index DDL with the expenses table
+from . import user_cache  # registers cache eviction for user writes
 
-__all__ = ['User', 'Expense', 'Category']
+__all__ = ['User', 'Expense', 'Category', 'ExpenseRollup', 'DataVersion']
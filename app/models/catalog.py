@@ -0,0 +1,117 @@
+"""
+Process-wide category catalog cache
+"""
+import time
+from collections import namedtuple
+from itertools import chain
+from threading import Lock
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models.expense import Category
+from app.models.version import DataVersion
+
+
+class CatalogCategory(namedtuple('CatalogCategory', 'id name description color created_at')):
+    """Read-only snapshot of a category, safe to share between requests"""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """Convert category snapshot to dictionary"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'color': self.color,
+            'created_at': self.created_at
+        }
+
+
+class CategoryCatalog:
+    """Every category by id and by name, shared by all requests in a process
+
+    Category writes committed in this process invalidate it immediately.
+    Writes from other processes bump the 'categories' data version, which is
+    re-checked at most every CATEGORY_CATALOG_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._ordered = []
+        self._by_id = {}
+        self._by_name = {}
+
+    def _is_fresh(self, now):
+        interval = current_app.config.get('CATEGORY_CATALOG_CHECK_INTERVAL', 5)
+        return self._version is not None and now - self._checked_at < interval
+
+    def _refresh(self):
+        """Reload the catalog if it was invalidated or its version moved on"""
+        now = time.monotonic()
+        if self._is_fresh(now):
+            return
+
+        with self._lock:
+            if self._is_fresh(now):
+                return
+
+            # Read the version first so a concurrent write can only make the
+            # snapshot newer than its version, never older
+            version = DataVersion.get(DataVersion.CATEGORIES)
+            if version != self._version:
+                ordered = [
+                    CatalogCategory(*row) for row in db.session.query(
+                        Category.id, Category.name, Category.description,
+                        Category.color, Category.created_at
+                    ).order_by(Category.id)
+                ]
+                self._ordered = ordered
+                self._by_id = {category.id: category for category in ordered}
+                self._by_name = {category.name: category for category in ordered}
+                self._version = version
+            self._checked_at = now
+
+    def all(self):
+        """Get every category, ordered by id"""
+        self._refresh()
+        return list(self._ordered)
+
+    def get(self, category_id):
+        """Get a category by id, or None"""
+        self._refresh()
+        return self._by_id.get(category_id)
+
+    def get_by_name(self, name):
+        """Get a category by its unique name, or None"""
+        self._refresh()
+        return self._by_name.get(name)
+
+    def invalidate(self):
+        """Force a reload on next access"""
+        with self._lock:
+            self._version = None
+
+
+category_catalog = CategoryCatalog()
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_category_writes(session, flush_context):
+    if any(isinstance(obj, Category)
+           for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['category_catalog_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('category_catalog_stale', False):
+        category_catalog.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('category_catalog_stale', None)
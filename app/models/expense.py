@@ -2,8 +2,15 @@
 Expense model for tracking expenses
 """
 from app import db
-from datetime import datetime
-from sqlalchemy import func
+from datetime import date, datetime
+from sqlalchemy import and_, case, event, func, inspect
+from sqlalchemy.orm import aliased, joinedload
+from app.models.version import DataVersion
+from app.utils.cache import VersionedCache
+from app.utils.database import upsert
+
+# Summary stats per (user_id, year, month), valid while the user's data version holds
+_summary_stats_cache = VersionedCache(maxsize=4096)
 
 
 class Category(db.Model):
@@ -27,7 +34,7 @@ class Category(db.Model):
             'name': self.name,
             'description': self.description,
             'color': self.color,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
     
     def __repr__(self):
@@ -53,8 +60,10 @@ class Expense(db.Model):
     
     # Indexes for better performance
     __table_args__ = (
-        db.Index('idx_user_date', 'user_id', 'date'),
         db.Index('idx_user_category', 'user_id', 'category_id'),
+        # Serves (user_id, date) lookups and covers the rollup aggregates
+        # (rebuild, verify) without touching the table rows
+        db.Index('idx_user_date_category_amount', 'user_id', 'date', 'category_id', 'amount'),
     )
     
     def to_dict(self):
@@ -63,39 +72,321 @@ class Expense(db.Model):
             'id': self.id,
             'title': self.title,
             'description': self.description,
-            'amount': float(self.amount),
-            'date': self.date.isoformat(),
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'amount': self.amount,
+            'date': self.date,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'user_id': self.user_id,
             'category_id': self.category_id,
             'category': self.category.to_dict() if self.category else None
         }
     
+    @staticmethod
+    def for_user(user_id):
+        """Query a user's expenses with categories joined in, so serializing
+        a list with to_dict() does not issue one category SELECT per row"""
+        return Expense.query.options(joinedload(Expense.category))\
+            .filter(Expense.user_id == user_id)
+    
     @staticmethod
     def get_monthly_summary(user_id, year, month):
         """Get monthly expense summary for a user"""
         return db.session.query(
             Category.name.label('category'),
-            func.sum(Expense.amount).label('total'),
-            func.count(Expense.id).label('count')
-        ).join(Category).filter(
-            Expense.user_id == user_id,
-            func.extract('year', Expense.date) == year,
-            func.extract('month', Expense.date) == month
+            func.sum(ExpenseRollup.total).label('total'),
+            func.sum(ExpenseRollup.count).label('count')
+        ).join(Category, ExpenseRollup.category_id == Category.id).filter(
+            ExpenseRollup.user_id == user_id,
+            ExpenseRollup.year == year,
+            ExpenseRollup.month == month
         ).group_by(Category.name).all()
     
     @staticmethod
     def get_yearly_summary(user_id, year):
         """Get yearly expense summary for a user"""
         return db.session.query(
-            func.extract('month', Expense.date).label('month'),
-            func.sum(Expense.amount).label('total'),
-            func.count(Expense.id).label('count')
+            ExpenseRollup.month.label('month'),
+            func.sum(ExpenseRollup.total).label('total'),
+            func.sum(ExpenseRollup.count).label('count')
         ).filter(
-            Expense.user_id == user_id,
-            func.extract('year', Expense.date) == year
-        ).group_by(func.extract('month', Expense.date)).all()
+            ExpenseRollup.user_id == user_id,
+            ExpenseRollup.year == year
+        ).group_by(ExpenseRollup.month).order_by(ExpenseRollup.month).all()
+    
+    @staticmethod
+    def bulk_recategorize(query, category_id):
+        """Move every expense matched by ``query`` into another category
+
+        Runs as one UPDATE, whatever the number of rows. Rollups and data
+        versions are adjusted from a per-month pre-aggregate of the matched
+        rows, since bulk statements skip the ORM write hooks. Returns the
+        number of expenses moved.
+        """
+        ids = query.filter(Expense.category_id != category_id)\
+            .with_entities(Expense.id).scalar_subquery()
+        groups = ExpenseRollup._aggregate_expenses(expense_ids=ids).all()
+        
+        moved = Expense.query.filter(Expense.id.in_(ids)).update(
+            {Expense.category_id: category_id}, synchronize_session=False
+        )
+        
+        connection = db.session.connection()
+        for group in groups:
+            month = date(int(group.year), int(group.month), 1)
+            ExpenseRollup.adjust(connection, group.user_id, month, group.category_id,
+                                 -group.total, -group.count)
+            ExpenseRollup.adjust(connection, group.user_id, month, category_id,
+                                 group.total, group.count)
+        for user_id in {group.user_id for group in groups}:
+            DataVersion.bump(connection, DataVersion.user_key(user_id))
+        return moved
+    
+    @staticmethod
+    def bulk_delete(query):
+        """Delete every expense matched by ``query`` with one DELETE
+
+        Rollups and data versions are adjusted like bulk_recategorize.
+        Returns the number of expenses deleted.
+        """
+        ids = query.with_entities(Expense.id).scalar_subquery()
+        groups = ExpenseRollup._aggregate_expenses(expense_ids=ids).all()
+        
+        deleted = Expense.query.filter(Expense.id.in_(ids))\
+            .delete(synchronize_session=False)
+        
+        connection = db.session.connection()
+        for group in groups:
+            ExpenseRollup.adjust(connection, group.user_id,
+                                 date(int(group.year), int(group.month), 1),
+                                 group.category_id, -group.total, -group.count)
+        for user_id in {group.user_id for group in groups}:
+            DataVersion.bump(connection, DataVersion.user_key(user_id))
+        return deleted
     
     def __repr__(self):
         return f'<Expense {self.title}: ${self.amount}>'
+
+
+class ExpenseRollup(db.Model):
+    """Per-user monthly totals by category, maintained alongside expenses
+
+    Every insert, update and delete of an Expense adjusts the matching row in
+    the same flush, so summaries can read these few rows instead of
+    re-aggregating the expenses table.
+    """
+    
+    __tablename__ = 'expense_rollups'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+    total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    @staticmethod
+    def get_totals(user_id):
+        """Get (count, total) over all of a user's expenses"""
+        count, total = db.session.query(
+            func.sum(ExpenseRollup.count),
+            func.sum(ExpenseRollup.total)
+        ).filter(ExpenseRollup.user_id == user_id).one()
+        return count or 0, total or 0
+    
+    @staticmethod
+    def get_summary_stats(user_id, year, month):
+        """Get a user's overall and monthly stats in a single query
+
+        Results are cached in-process and reused until the user's data
+        version is bumped by an expense write.
+        """
+        version = DataVersion.get(DataVersion.user_key(user_id))
+        cache_key = (user_id, year, month)
+        stats = _summary_stats_cache.get(cache_key, version)
+        if stats is not None:
+            return stats
+        
+        # Aliased so the subquery is not correlated with the outer rollup scan
+        month_rollup = aliased(ExpenseRollup)
+        top_category = db.session.query(Category.name)\
+            .join(month_rollup, month_rollup.category_id == Category.id)\
+            .filter(
+                month_rollup.user_id == user_id,
+                month_rollup.year == year,
+                month_rollup.month == month
+            ).group_by(Category.id, Category.name)\
+            .order_by(func.sum(month_rollup.total).desc())\
+            .limit(1).scalar_subquery()
+        
+        in_month = and_(ExpenseRollup.year == year, ExpenseRollup.month == month)
+        row = db.session.query(
+            func.sum(ExpenseRollup.count).label('count'),
+            func.sum(ExpenseRollup.total).label('total'),
+            func.sum(case((in_month, ExpenseRollup.total), else_=0)).label('monthly_total'),
+            top_category.label('top_category')
+        ).filter(ExpenseRollup.user_id == user_id).one()
+        
+        count = row.count or 0
+        stats = {
+            'monthly_total': float(row.monthly_total or 0),
+            'total_expenses': count,
+            'average_expense': float(row.total / count) if count else 0.0,
+            'top_category': row.top_category or 'None'
+        }
+        _summary_stats_cache.set(cache_key, version, stats)
+        return stats
+    
+    @staticmethod
+    def _aggregate_expenses(user_id=None, expense_ids=None):
+        """Aggregate the raw expenses table into rollup-shaped rows
+
+        ``expense_ids`` (a subquery of ids) limits it to a subset of rows.
+        """
+        year = func.extract('year', Expense.date)
+        month = func.extract('month', Expense.date)
+        query = db.session.query(
+            Expense.user_id,
+            year.label('year'),
+            month.label('month'),
+            Expense.category_id,
+            func.sum(Expense.amount).label('total'),
+            func.count(Expense.id).label('count')
+        )
+        if user_id is not None:
+            query = query.filter(Expense.user_id == user_id)
+        if expense_ids is not None:
+            query = query.filter(Expense.id.in_(expense_ids))
+        return query.group_by(Expense.user_id, year, month, Expense.category_id)
+    
+    @staticmethod
+    def rebuild(user_id=None):
+        """Recompute rollups from the expenses table (for one user or all)"""
+        rollups = ExpenseRollup.query
+        if user_id is not None:
+            rollups = rollups.filter(ExpenseRollup.user_id == user_id)
+        rollups.delete(synchronize_session=False)
+        
+        db.session.execute(
+            ExpenseRollup.__table__.insert().from_select(
+                ['user_id', 'year', 'month', 'category_id', 'total', 'count'],
+                ExpenseRollup._aggregate_expenses(user_id).statement
+            )
+        )
+    
+    @staticmethod
+    def verify(user_id=None):
+        """Compare rollups against the expenses table
+
+        Returns a list of (key, expected, actual) tuples for every mismatch,
+        where key is (user_id, year, month, category_id) and expected/actual
+        are (count, total) pairs or None.
+        """
+        expected = {
+            (row.user_id, int(row.year), int(row.month), row.category_id):
+                (row.count, round(float(row.total), 2))
+            for row in ExpenseRollup._aggregate_expenses(user_id)
+        }
+        rollups = ExpenseRollup.query
+        if user_id is not None:
+            rollups = rollups.filter(ExpenseRollup.user_id == user_id)
+        actual = {
+            (row.user_id, row.year, row.month, row.category_id):
+                (row.count, round(float(row.total), 2))
+            for row in rollups
+        }
+        
+        return [
+            (key, expected.get(key), actual.get(key))
+            for key in sorted(expected.keys() | actual.keys())
+            if expected.get(key) != actual.get(key)
+        ]
+    
+    @staticmethod
+    def adjust(connection, user_id, expense_date, category_id, amount, count):
+        """Add amount/count to the rollup row for a user, month and category
+
+        Creates the row when needed and removes it once its count drops to
+        zero. Runs on the given connection so it joins the caller's
+        transaction; bulk writers that bypass the ORM must call it themselves.
+        """
+        table = ExpenseRollup.__table__
+        key = and_(
+            table.c.user_id == user_id,
+            table.c.year == expense_date.year,
+            table.c.month == expense_date.month,
+            table.c.category_id == category_id
+        )
+        change = {'total': table.c.total + amount, 'count': table.c.count + count}
+        if count > 0:
+            upsert(connection, table, {
+                'user_id': user_id,
+                'year': expense_date.year,
+                'month': expense_date.month,
+                'category_id': category_id,
+                'total': amount,
+                'count': count
+            }, change)
+            return
+        
+        connection.execute(table.update().where(key).values(change))
+        if count < 0:
+            connection.execute(table.delete().where(key, table.c.count <= 0))
+    
+    def __repr__(self):
+        return f'<ExpenseRollup {self.user_id} {self.year}-{self.month:02d} {self.category_id}>'
+
+
+@event.listens_for(Category, 'after_insert')
+@event.listens_for(Category, 'after_update')
+@event.listens_for(Category, 'after_delete')
+def _bump_category_version(mapper, connection, target):
+    DataVersion.bump(connection, DataVersion.CATEGORIES)
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    """No-op; registered with active_history so old values are always loaded"""
+
+
+# The update hook needs the previous key/amount to move totals out of the old
+# rollup row, even when the attribute was expired before it was reassigned
+for _attribute in (Expense.user_id, Expense.date, Expense.category_id, Expense.amount):
+    event.listen(_attribute, 'set', _load_previous_value, active_history=True)
+
+
+@event.listens_for(Expense, 'after_insert')
+def _rollup_after_insert(mapper, connection, target):
+    ExpenseRollup.adjust(connection, target.user_id, target.date, target.category_id,
+                         target.amount, 1)
+    DataVersion.bump(connection, DataVersion.user_key(target.user_id))
+
+
+@event.listens_for(Expense, 'after_delete')
+def _rollup_after_delete(mapper, connection, target):
+    ExpenseRollup.adjust(connection, target.user_id, target.date, target.category_id,
+                         -target.amount, -1)
+    DataVersion.bump(connection, DataVersion.user_key(target.user_id))
+
+
+@event.listens_for(Expense, 'after_update')
+def _rollup_after_update(mapper, connection, target):
+    # Any change (title, description, ...) invalidates the user's cached data
+    DataVersion.bump(connection, DataVersion.user_key(target.user_id))
+    
+    state = inspect(target)
+    old = {}
+    changed = False
+    for name in ('user_id', 'date', 'category_id', 'amount'):
+        history = state.attrs[name].history
+        if history.deleted:
+            old[name] = history.deleted[0]
+            changed = True
+        else:
+            old[name] = getattr(target, name)
+    
+    if not changed:
+        return
+    
+    ExpenseRollup.adjust(connection, old['user_id'], old['date'], old['category_id'],
+                         -old['amount'], -1)
+    ExpenseRollup.adjust(connection, target.user_id, target.date, target.category_id,
+                         target.amount, 1)
@@ -0,0 +1,159 @@
+"""
+Full-text search index for expense titles and descriptions
+"""
+import re
+from weakref import WeakKeyDictionary
+from sqlalchemy import event, func, literal_column, select, table, column, text
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models.expense import Expense
+
+# SQLite: FTS5 external-content table over expenses, kept in sync by triggers
+# so every write path (ORM, bulk statements, raw SQL) updates it in the same
+# transaction as the row itself. user_id is indexed too, so a search matches
+# only the current user's rows instead of every user's and then filtering;
+# the rank gives it no weight.
+SQLITE_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5(
+        title, description, user_id, content='expenses', content_rowid='id'
+    )""",
+    "INSERT INTO expenses_fts(expenses_fts, rank) VALUES ('rank', 'bm25(1.0, 1.0, 0.0)')",
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_ai AFTER INSERT ON expenses BEGIN
+        INSERT INTO expenses_fts(rowid, title, description, user_id)
+        VALUES (new.id, new.title, new.description, new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_ad AFTER DELETE ON expenses BEGIN
+        INSERT INTO expenses_fts(expenses_fts, rowid, title, description, user_id)
+        VALUES ('delete', old.id, old.title, old.description, old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_fts_au AFTER UPDATE OF title, description, user_id ON expenses BEGIN
+        INSERT INTO expenses_fts(expenses_fts, rowid, title, description, user_id)
+        VALUES ('delete', old.id, old.title, old.description, old.user_id);
+        INSERT INTO expenses_fts(rowid, title, description, user_id)
+        VALUES (new.id, new.title, new.description, new.user_id);
+    END""",
+]
+SQLITE_TRIGGERS = ('expenses_fts_ai', 'expenses_fts_ad', 'expenses_fts_au')
+
+# PostgreSQL: expression GIN index, maintained by the database itself. Queries
+# must use the identical expression for the planner to pick the index.
+POSTGRES_DOCUMENT = (
+    "to_tsvector('simple', coalesce(expenses.title, '') || ' ' || "
+    "coalesce(expenses.description, ''))"
+)
+POSTGRES_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS idx_expenses_fts ON expenses USING GIN ("
+    "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '')))"
+)
+
+_fts = table('expenses_fts', column('rowid'), column('rank'))
+_index_available = WeakKeyDictionary()
+
+
+def create_search_index(connection, rebuild=False):
+    """Create the full-text index for the connection's backend if supported.
+
+    ``rebuild`` re-reads every expense into the index, for databases whose
+    expenses table predates the index; an index from before user_id was
+    indexed is recreated first.
+    """
+    dialect = connection.dialect.name
+    available = False
+
+    if dialect == 'sqlite':
+        try:
+            if rebuild and _sqlite_index_outdated(connection):
+                for trigger in SQLITE_TRIGGERS:
+                    connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {trigger}')
+                connection.exec_driver_sql('DROP TABLE expenses_fts')
+            for statement in SQLITE_INDEX_DDL:
+                connection.exec_driver_sql(statement)
+            if rebuild:
+                connection.exec_driver_sql(
+                    "INSERT INTO expenses_fts(expenses_fts) VALUES ('rebuild')"
+                )
+            available = True
+        except OperationalError:
+            # SQLite built without FTS5; searches fall back to LIKE
+            available = False
+    elif dialect == 'postgresql':
+        connection.exec_driver_sql(POSTGRES_INDEX_DDL)
+        available = True
+
+    _index_available[connection.engine] = available
+    return available
+
+
+def _sqlite_index_outdated(connection):
+    """Whether an existing expenses_fts table lacks the user_id column"""
+    columns = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE name = 'expenses_fts'"
+    ).scalar()
+    return columns is not None and 'user_id' not in columns
+
+
+def drop_search_index(connection):
+    """Drop the SQLite FTS table (triggers go away with the expenses table)"""
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('DROP TABLE IF EXISTS expenses_fts')
+    _index_available.pop(connection.engine, None)
+
+
+@event.listens_for(Expense.__table__, 'after_create')
+def _create_index_with_table(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(Expense.__table__, 'before_drop')
+def _drop_index_with_table(target, connection, **kw):
+    drop_search_index(connection)
+
+
+def search_index_available():
+    """Whether the current database has a usable full-text index"""
+    engine = db.engine
+    if engine not in _index_available:
+        if engine.dialect.name == 'sqlite':
+            exists = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'expenses_fts'")
+            ).first()
+            _index_available[engine] = exists is not None
+        else:
+            _index_available[engine] = engine.dialect.name == 'postgresql'
+    return _index_available[engine]
+
+
+def apply_search(query, search, user_id):
+    """Restrict an expense query to ``user_id``'s rows matching ``search``.
+
+    Every word is matched as a prefix and all words must match. Returns the
+    filtered query and a relevance expression to order by (best first), or
+    None when the index is unavailable and a LIKE scan was used instead.
+    The query is expected to filter on ``user_id`` already.
+    """
+    terms = re.findall(r'\w+', search)
+
+    if terms and search_index_available():
+        if db.engine.dialect.name == 'sqlite':
+            words = ' '.join(f'"{term}"*' for term in terms)
+            match = f'user_id:"{int(user_id)}" AND {{title description}}:({words})'
+            # Materialized so the match runs once; joined as a plain subquery
+            # SQLite re-runs it for every one of the user's rows
+            matches = select(
+                _fts.c.rowid.label('expense_id'),
+                _fts.c.rank.label('rank')
+            ).where(literal_column('expenses_fts').op('MATCH')(match)) \
+                .cte('expense_matches', nesting=True).prefix_with('MATERIALIZED')
+            query = query.join(matches, matches.c.expense_id == Expense.id)
+            return query, matches.c.rank
+
+        document = literal_column(POSTGRES_DOCUMENT)
+        tsquery = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+        query = query.filter(document.op('@@')(tsquery))
+        return query, func.ts_rank(document, tsquery).desc()
+
+    query = query.filter(
+        Expense.title.contains(search) |
+        Expense.description.contains(search)
+    )
+    return query, None
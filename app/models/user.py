@@ -3,7 +3,6 @@ User model for authentication
 """
 from flask_sqlalchemy import SQLAlchemy  
 from flask_login import UserMixin
-from flask_bcrypt import generate_password_hash, check_password_hash
 from app import db
 from datetime import datetime
 
@@ -29,23 +28,59 @@ class User(db.Model, UserMixin):
         """Initialize user with hashed password"""
         self.username = username
         self.email = email
-        self.password_hash = generate_password_hash(password).decode('utf-8')
+        self.set_password(password)
         self.first_name = first_name
         self.last_name = last_name
     
     def check_password(self, password):
         """Check if provided password matches stored hash"""
-        return check_password_hash(self.password_hash, password)
+        from app.utils.passwords import check_password
+        return check_password(self.password_hash, password)
     
     def set_password(self, password):
         """Set new password with hash"""
-        self.password_hash = generate_password_hash(password).decode('utf-8')
+        from app.utils.passwords import hash_password
+        self.password_hash = hash_password(password)
+    
+    def rehash_password_if_needed(self, password):
+        """Re-hash a just-verified password if BCRYPT_LOG_ROUNDS has changed
+
+        Returns True when the hash was replaced and needs to be committed.
+        """
+        from app.utils.passwords import needs_rehash
+        if not needs_rehash(self.password_hash):
+            return False
+        self.set_password(password)
+        return True
     
     @property
     def full_name(self):
         """Get user's full name"""
         return f"{self.first_name} {self.last_name}"
     
+    @staticmethod
+    def delete_account(user_id):
+        """Delete a user and everything they own with set-based statements
+
+        Unlike session.delete(user), whose cascade loads every expense into
+        memory first, this runs one DELETE per table. Returns the number of
+        expenses deleted.
+        """
+        from app.models.expense import Expense, ExpenseRollup
+        from app.models.version import DataVersion
+        
+        deleted = Expense.query.filter(Expense.user_id == user_id)\
+            .delete(synchronize_session=False)
+        ExpenseRollup.query.filter(ExpenseRollup.user_id == user_id)\
+            .delete(synchronize_session=False)
+        # Bumped rather than removed: SQLite may reuse the id, and the new
+        # user must never match versions cached for the old one
+        DataVersion.bump(db.session.connection(), DataVersion.user_key(user_id))
+        User.query.filter(User.id == user_id).delete(synchronize_session=False)
+        # Bulk deletes skip the flush hooks that evict cached users (see user_cache)
+        db.session.info.setdefault('stale_user_ids', set()).add(user_id)
+        return deleted
+    
     def to_dict(self):
         """Convert user object to dictionary"""
         return {
@@ -55,9 +90,10 @@ class User(db.Model, UserMixin):
             'first_name': self.first_name,
             'last_name': self.last_name,
             'full_name': self.full_name,
-            'created_at': self.created_at.isoformat(),
+            'created_at': self.created_at,
             'is_active': self.is_active
         }
     
     def __repr__(self):
         return f'<User {self.username}>'
+
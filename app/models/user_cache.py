@@ -0,0 +1,59 @@
+"""
+Per-process cache of the users behind authenticated sessions
+"""
+from itertools import chain
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app import db
+from app.models.user import User
+from app.utils.cache import TTLCache
+
+# Column values of recently loaded users by id
+_user_cache = TTLCache(maxsize=4096)
+
+
+def load_user(user_id):
+    """Get an active user by id for the Flask-Login user loader, or None
+
+    Column values are cached for USER_CACHE_TTL seconds, so authenticated
+    requests skip the primary-key SELECT. The returned instance is attached
+    to the current session without a query. Commits in this process that
+    change or delete a user evict it; other processes pick changes up when
+    the entry expires.
+    """
+    values = _user_cache.get(user_id)
+    if values is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        _user_cache.set(user_id, values, current_app.config.get('USER_CACHE_TTL', 30))
+    
+    if not values['is_active']:
+        return None
+    
+    user = User.__mapper__.class_manager.new_instance()
+    for key, value in values.items():
+        setattr(user, key, value)
+    make_transient_to_detached(user)
+    # Reuses the identity-map instance if this session already has one
+    return db.session.merge(user, load=False)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_user_writes(session, flush_context):
+    user_ids = {obj.id for obj in chain(session.dirty, session.deleted) if isinstance(obj, User)}
+    if user_ids:
+        session.info.setdefault('stale_user_ids', set()).update(user_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _evict_after_commit(session):
+    for user_id in session.info.pop('stale_user_ids', ()):
+        _user_cache.delete(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('stale_user_ids', None)
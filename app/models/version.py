@@ -0,0 +1,50 @@
+"""
+Data version counters used to validate caches across requests and processes
+"""
+from app import db
+from datetime import datetime
+from app.utils.database import upsert
+
+
+class DataVersion(db.Model):
+    """Monotonic change counter per data scope (e.g. one user's expenses)"""
+    
+    __tablename__ = 'data_versions'
+    
+    key = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    # Key of the counter bumped on every category write
+    CATEGORIES = 'categories'
+    
+    @staticmethod
+    def user_key(user_id):
+        """Key of the counter bumped on every write to a user's expenses"""
+        return f'user:{user_id}'
+    
+    @staticmethod
+    def get(key):
+        """Get the current version of a scope (0 if it was never written)"""
+        version = db.session.query(DataVersion.version)\
+            .filter(DataVersion.key == key).scalar()
+        return version or 0
+    
+    @staticmethod
+    def get_many(keys):
+        """Get {key: row} with version and updated_at for the scopes that exist"""
+        rows = db.session.query(
+            DataVersion.key, DataVersion.version, DataVersion.updated_at
+        ).filter(DataVersion.key.in_(keys)).all()
+        return {row.key: row for row in rows}
+    
+    @staticmethod
+    def bump(connection, key):
+        """Increment a scope's version on the given connection/transaction"""
+        table = DataVersion.__table__
+        now = datetime.utcnow()
+        upsert(connection, table, {'key': key, 'version': 1, 'updated_at': now},
+               {'version': table.c.version + 1, 'updated_at': now})
+    
+    def __repr__(self):
+        return f'<DataVersion {self.key}={self.version}>'
@@ -1,14 +1,28 @@
 """
 API routes for AJAX requests and data operations
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify, Response, stream_with_context, send_file, url_for
 from flask_login import login_required, current_user
 from app import db
-from app.models.expense import Expense, Category
+from app.models.expense import Expense, Category, ExpenseRollup
+from app.models.search import apply_search
+from app.models.catalog import category_catalog
+from app.models.version import DataVersion
+from app.session import prefer_replica
+from app.utils.conditional import conditional_get
+from app.utils import pdf_export
 from app.utils.validators import validate_expense
 from datetime import datetime, date
+import base64
 import csv
 import io
+import json
+from collections import defaultdict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
@@ -18,66 +32,250 @@ from reportlab.lib.styles import getSampleStyleSheet
 
 api_bp = Blueprint('api', __name__)
 
+# Rows fetched per round trip (and flushed per CSV chunk) when exporting
+EXPORT_BATCH_SIZE = 500
 
-@api_bp.route('/expenses', methods=['GET'])
-@login_required
-def get_expenses():
-    """Get expenses with optional filtering"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    category_id = request.args.get('category_id', type=int)
-    search = request.args.get('search', '').strip()
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    # Build query
-    query = Expense.query.filter_by(user_id=current_user.id)
+CSV_HEADER = ['Date', 'Title', 'Description', 'Amount', 'Category']
+
+# Validated rows inserted (and committed) per executemany when importing
+IMPORT_CHUNK_SIZE = 1000
+
+# Upper bound on operations accepted by one /expenses/batch request
+MAX_BATCH_OPERATIONS = 500
+
+# Fields GET /api/expenses can return (see ``fields=``); 'category' is the nested category
+EXPENSE_FIELDS = ('id', 'title', 'description', 'amount', 'date', 'created_at', 'updated_at',
+                  'user_id', 'category_id', 'category')
+CATEGORY_FIELDS = ('id', 'name', 'description', 'color', 'created_at')
+
+
+def _apply_expense_filters(query, args, user_id, order_by_relevance=False):
+    """Apply the category/search/date filters shared by listing and export.
+
+    ``query`` must already be limited to ``user_id``'s expenses; full-text
+    search only looks at theirs. With ``order_by_relevance`` full-text
+    matches are ranked best first.
+    Raises ValueError with a user-facing message on malformed dates.
+    """
+    category_id = args.get('category_id', type=int)
+    search = args.get('search', '').strip()
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
     
-    # Apply filters
     if category_id:
-        query = query.filter_by(category_id=category_id)
+        query = query.filter(Expense.category_id == category_id)
     
     if search:
-        query = query.filter(
-            Expense.title.contains(search) |
-            Expense.description.contains(search)
-        )
+        query, rank = apply_search(query, search, user_id)
+        if order_by_relevance and rank is not None:
+            query = query.order_by(rank)
     
     if start_date:
         try:
             start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            query = query.filter(Expense.date >= start_date_obj)
         except ValueError:
-            return jsonify({'error': 'Invalid start date format'}), 400
+            raise ValueError('Invalid start date format')
+        query = query.filter(Expense.date >= start_date_obj)
     
     if end_date:
         try:
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            query = query.filter(Expense.date <= end_date_obj)
         except ValueError:
-            return jsonify({'error': 'Invalid end date format'}), 400
+            raise ValueError('Invalid end date format')
+        query = query.filter(Expense.date <= end_date_obj)
+    
+    return query
+
+
+def _encode_cursor(row):
+    """Build an opaque cursor pointing just past the given listing row"""
+    key = [row.sort_date.isoformat(), row.sort_created_at.isoformat(), row.sort_id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor into its (date, created_at, id) sort key"""
+    try:
+        date_str, created_str, expense_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return (date.fromisoformat(date_str),
+                datetime.fromisoformat(created_str),
+                int(expense_id))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def _parse_fields(value):
+    """The requested ``fields=`` in EXPENSE_FIELDS order, or all of them"""
+    if not value:
+        return EXPENSE_FIELDS
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(EXPENSE_FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+    return tuple(name for name in EXPENSE_FIELDS if name in requested)
+
+
+def _expense_rows(user_id, fields):
+    """Core SELECT of just the columns ``fields`` need, and a row -> dict function
+
+    Rows skip the ORM (no instances, no identity map) and become the same
+    dicts as ``Expense.to_dict()``, restricted to ``fields``. The keyset sort
+    key is always selected, last, so cursors work whatever was asked for.
+    """
+    names = [name for name in fields if name != 'category']
+    columns = [getattr(Expense, name) for name in names]
+    with_category = 'category' in fields
+    if with_category:
+        columns += [getattr(Category, name).label(f'category_{name}') for name in CATEGORY_FIELDS]
+    columns += [Expense.date.label('sort_date'), Expense.created_at.label('sort_created_at'),
+                Expense.id.label('sort_id')]
+    
+    query = select(*columns).select_from(Expense)
+    if with_category:
+        query = query.outerjoin(Category, Expense.category_id == Category.id)
+    query = query.where(Expense.user_id == user_id)
+    
+    category_start = len(names)
+    category_end = category_start + len(CATEGORY_FIELDS)
+    
+    def to_dict(row):
+        data = dict(zip(names, row))
+        if with_category:
+            category = row[category_start:category_end]
+            data['category'] = dict(zip(CATEGORY_FIELDS, category)) if category[0] is not None else None
+        return data
+    
+    return query, to_dict
+
+
+def _count_rows(query):
+    """Total rows of a listing SELECT, ignoring its ordering and projection"""
+    ids = query.order_by(None).with_only_columns(Expense.id, maintain_column_froms=True)
+    return db.session.execute(select(func.count()).select_from(ids.subquery())).scalar()
+
+
+def _cursor_page(query, per_page):
+    """Keyset pagination over (date, created_at, id), newest first.
+
+    Seeks past the cursor instead of using OFFSET, so every page costs the
+    same as the first. The total count is only run when asked for.
+    """
+    cursor = request.args.get('cursor')
+    if cursor:
+        cursor_date, cursor_created, cursor_id = _decode_cursor(cursor)
+        query = query.filter(
+            Expense.date <= cursor_date,
+            or_(
+                Expense.date < cursor_date,
+                Expense.created_at < cursor_created,
+                and_(Expense.created_at == cursor_created, Expense.id < cursor_id)
+            )
+        )
+    
+    total = _count_rows(query) if request.args.get('include_total', 0, type=int) else None
+    
+    # Fetch one extra row to learn whether another page exists
+    rows = db.session.execute(query.order_by(
+        Expense.date.desc(), Expense.created_at.desc(), Expense.id.desc()
+    ).limit(per_page + 1)).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    
+    pagination = {
+        'per_page': per_page,
+        'has_next': has_next,
+        'next_cursor': _encode_cursor(rows[-1]) if has_next else None
+    }
+    if total is not None:
+        pagination['total'] = total
+    
+    return rows, pagination
+
+
+def _offset_page(query, page, per_page):
+    """Page-number pagination with the same metadata as Flask-SQLAlchemy's paginate()"""
+    page = max(page, 1)
+    per_page = per_page if per_page > 0 else 20
+    total = _count_rows(query)
+    rows = db.session.execute(query.limit(per_page).offset((page - 1) * per_page)).all()
+    pages = -(-total // per_page)
+    
+    return rows, {
+        'page': page,
+        'pages': pages,
+        'per_page': per_page,
+        'total': total,
+        'has_next': page < pages,
+        'has_prev': page > 1
+    }
+
+
+def _user_and_category_versions():
+    """Data versions an expense listing depends on"""
+    return [DataVersion.user_key(current_user.id), DataVersion.CATEGORIES]
+
+
+@api_bp.route('/expenses', methods=['GET'])
+@login_required
+@prefer_replica
+@conditional_get(_user_and_category_versions)
+def get_expenses():
+    """Get expenses with optional filtering
+
+    Uses page numbers by default; ``pagination=cursor`` switches to keyset
+    pagination driven by the opaque ``cursor``/``next_cursor`` values.
+    ``search`` uses the full-text index and, with page numbers, returns the
+    best matches first. ``fields`` (comma-separated, from EXPENSE_FIELDS)
+    limits each expense to those keys and the query to their columns.
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    
+    # Build query
+    try:
+        query, to_dict = _expense_rows(current_user.id, _parse_fields(request.args.get('fields')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Apply filters; keyset pagination needs the plain date ordering
+    cursor_mode = request.args.get('pagination') == 'cursor'
+    try:
+        query = _apply_expense_filters(query, request.args, current_user.id,
+                                       order_by_relevance=not cursor_mode)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if cursor_mode:
+        try:
+            rows, pagination = _cursor_page(query, max(per_page, 1))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'expenses': [to_dict(row) for row in rows],
+            'pagination': pagination
+        })
     
     # Order by date (newest first)
     query = query.order_by(Expense.date.desc(), Expense.created_at.desc())
     
     # Paginate
-    expenses = query.paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    rows, pagination = _offset_page(query, page, per_page)
     
     return jsonify({
-        'expenses': [expense.to_dict() for expense in expenses.items],
-        'pagination': {
-            'page': expenses.page,
-            'pages': expenses.pages,
-            'per_page': expenses.per_page,
-            'total': expenses.total,
-            'has_next': expenses.has_next,
-            'has_prev': expenses.has_prev
-        }
+        'expenses': [to_dict(row) for row in rows],
+        'pagination': pagination
     })
 
 
+def _add_expense(fields):
+    """Add an expense to the session and flush it; returns its dict"""
+    expense = Expense(**fields)
+    db.session.add(expense)
+    db.session.flush()
+    return expense.to_dict()
+
+
 @api_bp.route('/expenses', methods=['POST'])
 @login_required
 def create_expense():
@@ -99,22 +297,36 @@ def create_expense():
         # Parse date
         expense_date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else date.today()
         
-        # Create expense
-        expense = Expense(
-            title=title,
-            description=description,
-            amount=float(amount),
-            date=expense_date,
-            user_id=current_user.id,
-            category_id=int(category_id)
-        )
+        fields = {
+            'title': title,
+            'description': description,
+            'amount': float(amount),
+            'date': expense_date,
+            'user_id': current_user.id,
+            'category_id': int(category_id)
+        }
         
-        db.session.add(expense)
-        db.session.commit()
+        writer = current_app.extensions.get('group_commit')
+        if writer is not None:
+            # Shares a commit with other expenses created at the same moment
+            future = writer.submit(lambda: _add_expense(fields))
+            try:
+                expense_data = future.result(timeout=current_app.config['GROUP_COMMIT_TIMEOUT'])
+            except FutureTimeoutError:
+                # Withdraw it so a retry cannot create a duplicate; once its
+                # batch has started, wait for the real outcome instead
+                if future.cancel():
+                    response = jsonify({'error': 'Server busy, expense was not created; please retry'})
+                    response.headers['Retry-After'] = '1'
+                    return response, 503
+                expense_data = future.result()
+        else:
+            expense_data = _add_expense(fields)
+            db.session.commit()
         
         return jsonify({
             'message': 'Expense created successfully',
-            'expense': expense.to_dict()
+            'expense': expense_data
         }), 201
         
     except Exception as e:
@@ -122,6 +334,162 @@ def create_expense():
         return jsonify({'error': 'Failed to create expense'}), 500
 
 
+def _read_import_rows(stream, import_format):
+    """Yield (row_number, fields) from an uploaded CSV or JSON lines stream
+
+    CSV uses the export layout (Date, Title, Description, Amount, Category);
+    JSON lines objects use the API field names and may give either
+    category_id or a category name. fields is None for unparseable lines.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    
+    if import_format == 'csv':
+        for row_number, row in enumerate(csv.DictReader(text), 1):
+            yield row_number, {
+                'date': row.get('Date'),
+                'title': row.get('Title'),
+                'description': row.get('Description'),
+                'amount': row.get('Amount'),
+                'category': row.get('Category')
+            }
+        return
+    
+    for row_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            fields = None
+        yield row_number, fields if isinstance(fields, dict) else None
+
+
+def _prepare_import_row(fields):
+    """Validate one imported row and build its insert values
+
+    Returns (values, errors); categories are resolved by name through the
+    category catalog, so no per-row lookups reach the database.
+    """
+    if fields is None:
+        return None, ['Invalid JSON line']
+    
+    title = str(fields.get('title') or '').strip()
+    description = str(fields.get('description') or '').strip()
+    # JSON lines may carry numbers (or anything else); parse everything as text
+    amount = fields.get('amount')
+    amount = str(amount).strip() if amount is not None else None
+    date_str = str(fields['date']).strip() if fields.get('date') else None
+    category_id = fields.get('category_id')
+    
+    if not category_id and fields.get('category'):
+        category = category_catalog.get_by_name(str(fields['category']).strip())
+        if category is None:
+            return None, [f"Unknown category '{fields['category']}'"]
+        category_id = category.id
+    
+    errors = validate_expense(title, amount, category_id, date_str)
+    if not errors and category_catalog.get(int(category_id)) is None:
+        errors.append('Invalid category selected')
+    if errors:
+        return None, errors
+    
+    return {
+        'title': title,
+        'description': description,
+        'amount': float(amount),
+        'date': datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else date.today(),
+        'user_id': current_user.id,
+        'category_id': int(category_id)
+    }, []
+
+
+def _insert_import_chunk(rows):
+    """Insert validated rows in one executemany and commit them
+
+    The bulk insert bypasses the ORM, so rollups and the user's data version
+    are updated here, in the same transaction.
+    """
+    db.session.execute(Expense.__table__.insert(), rows)
+    
+    totals = defaultdict(lambda: [0, 0])
+    for row in rows:
+        key = (row['date'].replace(day=1), row['category_id'])
+        totals[key][0] += row['amount']
+        totals[key][1] += 1
+    
+    connection = db.session.connection()
+    for (month_start, category_id), (amount, count) in totals.items():
+        ExpenseRollup.adjust(connection, current_user.id, month_start, category_id, amount, count)
+    DataVersion.bump(connection, DataVersion.user_key(current_user.id))
+    
+    db.session.commit()
+
+
+@api_bp.route('/expenses/import', methods=['POST'])
+@login_required
+def import_expenses():
+    """Bulk import expenses from a CSV or JSON lines upload
+
+    The request body is read as a stream (``format=csv`` or ``format=jsonl``,
+    defaulting from the Content-Type). Valid rows are inserted in chunks of
+    IMPORT_CHUNK_SIZE, each in its own transaction; invalid rows are skipped
+    and reported by row number.
+    """
+    import_format = request.args.get('format')
+    if import_format is None:
+        import_format = 'csv' if request.mimetype == 'text/csv' else 'jsonl'
+    if import_format not in ('csv', 'jsonl'):
+        return jsonify({'error': 'Format must be csv or jsonl'}), 400
+    
+    imported = 0
+    errors = []
+    chunk = []
+    chunk_rows = []
+    
+    def flush():
+        nonlocal imported
+        try:
+            _insert_import_chunk(chunk)
+            imported += len(chunk)
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Import chunk of %d rows failed; retrying row by row', len(chunk))
+            # Only the rows the database rejects on their own are reported
+            for row_number, values in zip(chunk_rows, chunk):
+                try:
+                    _insert_import_chunk([values])
+                    imported += 1
+                except Exception:
+                    db.session.rollback()
+                    current_app.logger.exception('Import row %s failed', row_number)
+                    errors.append({'row': row_number, 'errors': ['Failed to import row']})
+        chunk.clear()
+        chunk_rows.clear()
+    
+    try:
+        for row_number, fields in _read_import_rows(request.stream, import_format):
+            values, row_errors = _prepare_import_row(fields)
+            if row_errors:
+                errors.append({'row': row_number, 'errors': row_errors})
+                continue
+            
+            chunk.append(values)
+            chunk_rows.append(row_number)
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                flush()
+    except (UnicodeDecodeError, csv.Error):
+        errors.append({'row': None, 'errors': ['Upload could not be parsed']})
+    
+    if chunk:
+        flush()
+    
+    return jsonify({
+        'imported': imported,
+        'failed': len(errors),
+        'errors': errors
+    })
+
+
 @api_bp.route('/expenses/<int:expense_id>', methods=['PUT'])
 @login_required
 def update_expense(expense_id):
@@ -182,11 +550,236 @@ def delete_expense(expense_id):
         return jsonify({'error': 'Failed to delete expense'}), 500
 
 
+def _read_expense_fields(data):
+    """Validate an expense payload like create/update_expense do
+
+    Returns (fields, errors); fields['date'] is None when no date was given.
+    """
+    if not isinstance(data, dict):
+        return None, ['Expense data must be an object']
+    
+    title = str(data.get('title') or '').strip()
+    description = str(data.get('description') or '').strip()
+    amount = data.get('amount')
+    category_id = data.get('category_id')
+    date_str = data.get('date')
+    
+    errors = validate_expense(title, amount, category_id, date_str)
+    if not errors and category_catalog.get(int(category_id)) is None:
+        errors.append('Invalid category selected')
+    if errors:
+        return None, errors
+    
+    return {
+        'title': title,
+        'description': description,
+        'amount': float(amount),
+        'category_id': int(category_id),
+        'date': datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else None
+    }, []
+
+
+def _operation_id(operation):
+    """Get the integer expense id targeted by a batch operation, or None"""
+    try:
+        return int(operation.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+@api_bp.route('/expenses/batch', methods=['POST'])
+@login_required
+def batch_expenses():
+    """Apply many create/update/delete operations in one request
+
+    Body: ``{"operations": [{"op": "create", "data": {...}},
+    {"op": "update", "id": 1, "data": {...}}, {"op": "delete", "id": 2}]}``.
+    Every targeted expense is fetched in one query scoped to the current
+    user. Invalid operations are reported and skipped; the rest are committed
+    in a single transaction. Results are returned in request order.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations') if isinstance(data, dict) else None
+    
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'A list of operations is required'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'}), 400
+    
+    target_ids = {
+        _operation_id(operation) for operation in operations
+        if isinstance(operation, dict) and operation.get('op') in ('update', 'delete')
+    }
+    target_ids.discard(None)
+    expenses = {}
+    if target_ids:
+        expenses = {
+            expense.id: expense for expense in Expense.query.filter(
+                Expense.user_id == current_user.id,
+                Expense.id.in_(target_ids)
+            )
+        }
+    
+    results = []
+    written = []
+    
+    for index, operation in enumerate(operations):
+        result = {'index': index}
+        results.append(result)
+        
+        if not isinstance(operation, dict):
+            result.update(status='error', errors=['Invalid operation'])
+            continue
+        
+        op = operation.get('op')
+        if op == 'create':
+            fields, errors = _read_expense_fields(operation.get('data', {}))
+            if errors:
+                result.update(status='error', errors=errors)
+                continue
+            
+            fields['date'] = fields['date'] or date.today()
+            expense = Expense(user_id=current_user.id, **fields)
+            db.session.add(expense)
+            result['status'] = 'created'
+            written.append((result, expense))
+        
+        elif op in ('update', 'delete'):
+            expense = expenses.get(_operation_id(operation))
+            if expense is None:
+                result.update(status='error', errors=['Expense not found'])
+                continue
+            
+            if op == 'delete':
+                db.session.delete(expense)
+                del expenses[expense.id]
+                result.update(status='deleted', id=expense.id)
+                continue
+            
+            fields, errors = _read_expense_fields(operation.get('data', {}))
+            if errors:
+                result.update(status='error', errors=errors)
+                continue
+            
+            if fields['date'] is None:
+                del fields['date']
+            for name, value in fields.items():
+                setattr(expense, name, value)
+            result['status'] = 'updated'
+            written.append((result, expense))
+        
+        else:
+            result.update(status='error', errors=['Unknown operation'])
+    
+    try:
+        db.session.flush()
+        written_ids = [(result, expense.id) for result, expense in written]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to apply batch'}), 500
+    
+    # Serialize created/updated expenses with a single query
+    if written_ids:
+        fresh = {
+            expense.id: expense for expense in Expense.for_user(current_user.id)
+            .filter(Expense.id.in_([expense_id for result, expense_id in written_ids]))
+        }
+        for result, expense_id in written_ids:
+            if expense_id in fresh:
+                result['expense'] = fresh[expense_id].to_dict()
+    
+    return jsonify({
+        'results': results,
+        'applied': sum(result['status'] != 'error' for result in results),
+        'failed': sum(result['status'] == 'error' for result in results)
+    })
+
+
+def _bulk_filter_args(data):
+    """Filters for set-based operations from a JSON body, like the listing's
+
+    Values are parsed as text, as they would be from the query string.
+    """
+    return MultiDict({
+        key: str(data[key]) for key in ('category_id', 'search', 'start_date', 'end_date')
+        if data.get(key) not in (None, '')
+    })
+
+
+@api_bp.route('/expenses/recategorize', methods=['POST'])
+@login_required
+def recategorize_expenses():
+    """Move every expense matching the filters into ``to_category_id``
+
+    Body: the listing filters (``category_id`` selects the source category)
+    plus ``to_category_id``. Runs as a single UPDATE.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Filters must be a JSON object'}), 400
+    
+    try:
+        to_category_id = int(data.get('to_category_id'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Target category is required'}), 400
+    if category_catalog.get(to_category_id) is None:
+        return jsonify({'error': 'Target category not found'}), 404
+    
+    query = Expense.query.filter(Expense.user_id == current_user.id)
+    try:
+        query = _apply_expense_filters(query, _bulk_filter_args(data), current_user.id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        updated = Expense.bulk_recategorize(query, to_category_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to recategorize expenses'}), 500
+    
+    return jsonify({'message': f'{updated} expenses moved', 'updated': updated})
+
+
+@api_bp.route('/expenses/bulk-delete', methods=['POST'])
+@login_required
+def bulk_delete_expenses():
+    """Delete every expense matching the filters with a single DELETE
+
+    At least one filter is required; deleting everything goes through
+    account deletion instead.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Filters must be a JSON object'}), 400
+    
+    filters = _bulk_filter_args(data)
+    if not filters:
+        return jsonify({'error': 'At least one filter is required'}), 400
+    
+    query = Expense.query.filter(Expense.user_id == current_user.id)
+    try:
+        query = _apply_expense_filters(query, filters, current_user.id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        deleted = Expense.bulk_delete(query)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to delete expenses'}), 500
+    
+    return jsonify({'message': f'{deleted} expenses deleted', 'deleted': deleted})
+
+
 @api_bp.route('/categories', methods=['GET'])
 @login_required
+@conditional_get(lambda: [DataVersion.CATEGORIES])
 def get_categories():
     """Get all categories"""
-    categories = Category.query.all()
+    categories = category_catalog.all()
     return jsonify({
         'categories': [category.to_dict() for category in categories]
     })
@@ -206,8 +799,7 @@ def create_category():
         return jsonify({'error': 'Category name is required'}), 400
     
     # Check if category already exists
-    existing = Category.query.filter_by(name=name).first()
-    if existing:
+    if category_catalog.get_by_name(name):
         return jsonify({'error': 'Category already exists'}), 400
     
     try:
@@ -225,83 +817,179 @@ def create_category():
             'category': category.to_dict()
         }), 201
         
+    except IntegrityError:
+        # Created by another process since this process's catalog was loaded
+        db.session.rollback()
+        return jsonify({'error': 'Category already exists'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to create category'}), 500
 
 
+def _export_query(user_id, args):
+    """Rows for CSV/PDF exports, newest first, with the listing filters applied"""
+    query = db.session.query(
+        Expense.date,
+        Expense.title,
+        Expense.description,
+        Expense.amount,
+        Category.name.label('category')
+    ).outerjoin(Category, Expense.category_id == Category.id)\
+        .filter(Expense.user_id == user_id)
+    
+    query = _apply_expense_filters(query, args, user_id)
+    return query.order_by(Expense.date.desc(), Expense.created_at.desc(), Expense.id.desc())
+
+
+def _generate_csv(rows):
+    """Yield CSV text in chunks of EXPORT_BATCH_SIZE rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    
+    for count, row in enumerate(rows, 1):
+        writer.writerow([
+            row.date.strftime('%Y-%m-%d'),
+            row.title,
+            row.description or '',
+            float(row.amount),
+            row.category or ''
+        ])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    
+    yield buffer.getvalue()
+
+
 @api_bp.route('/export/csv')
 @login_required
+@prefer_replica
 def export_csv():
-    """Export expenses to CSV"""
-    expenses = Expense.query.filter_by(user_id=current_user.id)\
-        .order_by(Expense.date.desc()).all()
+    """Export expenses to CSV
+
+    Accepts the same filters as GET /api/expenses. With ``stream=1`` the file
+    is sent as a chunked ``text/csv`` download, reading rows from the database
+    in batches so memory stays flat regardless of export size.
+    """
+    try:
+        query = _export_query(current_user.id, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    rows = query.yield_per(EXPORT_BATCH_SIZE)
     
-    output = io.StringIO()
-    writer = csv.writer(output)
+    # Format current timestamp for filename
+    current_timestamp = datetime.now().strftime("%Y%m%d")
+    filename = f'expenses_{current_timestamp}.csv'
     
-    # Write header
-    writer.writerow(['Date', 'Title', 'Description', 'Amount', 'Category'])
+    if request.args.get('stream', 0, type=int):
+        return Response(
+            stream_with_context(_generate_csv(rows)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
     
-    # Write data
-    for expense in expenses:
-        writer.writerow([
-            expense.date.strftime('%Y-%m-%d'),
-            expense.title,
-            expense.description or '',
-            float(expense.amount),
-            expense.category.name if expense.category else ''
-        ])
+    return jsonify({
+        'csv_data': ''.join(_generate_csv(rows)),
+        'filename': filename
+    })
+
+
+@api_bp.route('/export/pdf', methods=['POST'])
+@login_required
+def export_pdf():
+    """Start a PDF statement export in the background
+
+    Accepts the same filters as GET /api/expenses (query string or JSON body).
+    Returns 202 with a job id; poll the status URL until the job is done,
+    then fetch the download URL.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Filters must be a JSON object'}), 400
+    # JSON values may be numbers; filters are parsed as text like the query string
+    filters = {
+        key: str(value) for key, value in {**request.args.to_dict(), **data}.items()
+        if key in ('category_id', 'search', 'start_date', 'end_date') and value not in (None, '')
+    }
     
-    output.seek(0)
-      # Format current timestamp for filename
-    current_timestamp = datetime.now().strftime("%Y%m%d")
+    try:
+        _export_query(current_user.id, MultiDict(filters))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job_id = pdf_export.new_job_id()
+    title = f'Expense statement - {current_user.full_name}'
+    try:
+        pdf_export.submit_export(job_id, current_user.id, filters, title)
+    except BrokenProcessPool:
+        response = jsonify({'error': 'PDF export is temporarily unavailable; please retry'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
     
     return jsonify({
-        'csv_data': output.getvalue(),
-        'filename': f'expenses_{current_timestamp}.csv'
+        'job_id': job_id,
+        'status_url': url_for('api.export_pdf_status', job_id=job_id),
+        'download_url': url_for('api.export_pdf_download', job_id=job_id)
+    }), 202
+
+
+def _export_job_status(job_id):
+    """Get the current user's export job status, or None"""
+    status = pdf_export.read_status(pdf_export.export_dir(), job_id)
+    if status is None or status.get('user_id') != current_user.id:
+        return None
+    return status
+
+
+@api_bp.route('/export/pdf/<job_id>')
+@login_required
+def export_pdf_status(job_id):
+    """Get the progress of a PDF export job"""
+    status = _export_job_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Export not found'}), 404
+    
+    return jsonify({
+        'job_id': job_id,
+        'state': status['state'],
+        'rows_done': status.get('rows_done', 0),
+        'rows_total': status.get('rows_total'),
+        'error': status.get('error')
     })
 
 
+@api_bp.route('/export/pdf/<job_id>/download')
+@login_required
+def export_pdf_download(job_id):
+    """Download a finished PDF export"""
+    status = _export_job_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Export not found'}), 404
+    if status['state'] != 'done':
+        return jsonify({'error': 'Export is not ready'}), 409
+    
+    filename = f'expenses_{datetime.fromtimestamp(status["updated_at"]).strftime("%Y%m%d")}.pdf'
+    return send_file(
+        pdf_export.pdf_path(pdf_export.export_dir(), job_id),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=filename
+    )
+
+
 @api_bp.route('/stats/summary')
 @login_required
+@prefer_replica
+@conditional_get(_user_and_category_versions, vary=lambda: datetime.now().strftime('%Y-%m'))
 def get_summary_stats():
     """Get summary statistics"""
-    from sqlalchemy import func, extract
-    
-    # Current month stats
     now = datetime.now()
-    current_month = now.month
-    current_year = now.year
-    
-    monthly_total = db.session.query(func.sum(Expense.amount))\
-        .filter(
-            Expense.user_id == current_user.id,
-            extract('year', Expense.date) == current_year,
-            extract('month', Expense.date) == current_month
-        ).scalar() or 0
-    
-    # Total expenses
-    total_expenses = Expense.query.filter_by(user_id=current_user.id).count()
-    
-    # Average expense
-    avg_expense = db.session.query(func.avg(Expense.amount))\
-        .filter_by(user_id=current_user.id).scalar() or 0
-      # Top category this month
-    top_category = db.session.query(
-        Category.name,
-        func.sum(Expense.amount).label('total')
-    ).join(Category).filter(
-        Expense.user_id == current_user.id,
-        extract('year', Expense.date) == current_year,
-        extract('month', Expense.date) == current_month
-    ).group_by(Category.name)\
-     .order_by(func.sum(Expense.amount).desc()).first()
+    stats = ExpenseRollup.get_summary_stats(current_user.id, now.year, now.month)
     
     return jsonify({
-        'monthly_total': float(monthly_total),
-        'total_expenses': total_expenses,
-        'average_expense': float(avg_expense),
-        'top_category': top_category.name if top_category else 'None',
+        **stats,
         'current_month': now.strftime('%B %Y')
     })
@@ -1,15 +1,31 @@
 """
 Authentication routes for user login, registration, and logout
 """
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, make_response
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from app.models.user import User
 from app.utils.validators import validate_registration, validate_login
+from app.utils.passwords import PasswordHashingBusy
 
 auth_bp = Blueprint('auth', __name__)
 
 
+@auth_bp.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(error):
+    """Shed load during login spikes instead of queueing without bound"""
+    error_msg = 'The server is busy. Please try again in a moment.'
+    if request.is_json:
+        response = jsonify({'success': False, 'errors': [error_msg]})
+    else:
+        flash(error_msg, 'error')
+        template = 'auth/register.html' if request.endpoint == 'auth.register' else 'auth/login.html'
+        response = make_response(render_template(template))
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """User login endpoint"""
@@ -44,6 +60,8 @@ def login():
         ).first()
         
         if user and user.check_password(password) and user.is_active:
+            if user.rehash_password_if_needed(password):
+                db.session.commit()
             login_user(user, remember=remember)
             
             if request.is_json:
@@ -125,6 +143,9 @@ def register():
             flash('Registration successful! Welcome to Expense Tracker!', 'success')
             return redirect(url_for('main.dashboard'))
             
+        except PasswordHashingBusy:
+            db.session.rollback()
+            raise
         except Exception as e:
             db.session.rollback()
             error_msg = 'Registration failed. Please try again.'
@@ -149,6 +170,30 @@ def logout():
     return redirect(url_for('auth.login'))
 
 
+@auth_bp.route('/account', methods=['DELETE'])
+@login_required
+def delete_account():
+    """Delete the current user's account and all of their expenses"""
+    data = request.get_json(silent=True) or {}
+    if not current_user.check_password(data.get('password', '')):
+        return jsonify({'success': False, 'errors': ['Password is incorrect']}), 403
+    
+    user_id = current_user.id
+    try:
+        deleted = User.delete_account(user_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'errors': ['Failed to delete account']}), 500
+    
+    logout_user()
+    return jsonify({
+        'success': True,
+        'message': 'Account deleted',
+        'deleted_expenses': deleted
+    })
+
+
 @auth_bp.route('/profile')
 @login_required
 def profile():
@@ -4,9 +4,13 @@ Main application routes for dashboard and expense management
 from flask import Blueprint, render_template, redirect, url_for
 from flask_login import login_required, current_user
 from app import db
-from app.models.expense import Expense, Category
+from app.models.expense import Expense, Category, ExpenseRollup
+from app.models.catalog import category_catalog
+from app.models.version import DataVersion
+from app.session import prefer_replica
+from app.utils.conditional import conditional_get
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract
+from sqlalchemy import func
 
 main_bp = Blueprint('main', __name__)
 
@@ -19,59 +23,67 @@ def index():
     return render_template('index.html')
 
 
+def _dashboard_versions():
+    """Data versions the dashboard fragments depend on"""
+    return [DataVersion.user_key(current_user.id), DataVersion.CATEGORIES]
+
+
 @main_bp.route('/dashboard')
 @login_required
 def dashboard():
-    """Main dashboard with expense overview"""
-    # Get current month and year
+    """Main dashboard with expense overview
+
+    The page itself only needs the cached summary stats, so its cost does
+    not grow with the number of expenses. Recent expenses and the category
+    chart load afterwards from the fragment endpoints below.
+    """
     now = datetime.now()
-    current_month = now.month
-    current_year = now.year
-    
-    # Get this month's expenses
-    monthly_expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        extract('year', Expense.date) == current_year,
-        extract('month', Expense.date) == current_month
-    ).all()
-    
-    # Calculate monthly total
-    monthly_total = sum(float(expense.amount) for expense in monthly_expenses)
-    
-    # Get recent expenses (last 10)
-    recent_expenses = Expense.query.filter_by(user_id=current_user.id)\
-        .order_by(Expense.created_at.desc()).limit(10).all()
-    
-    # Get monthly summary by category
-    monthly_summary = Expense.get_monthly_summary(current_user.id, current_year, current_month)
-    
-    # Get expense count
-    total_expenses = Expense.query.filter_by(user_id=current_user.id).count()
     
-    # Get categories for the form
-    categories = Category.query.all()
+    # One aggregate over the rollups, cached per user and data version
+    stats = ExpenseRollup.get_summary_stats(current_user.id, now.year, now.month)
     
-    return render_template('dashboard.html', 
-                         monthly_total=monthly_total,
-                         monthly_expenses=monthly_expenses,
-                         recent_expenses=recent_expenses,
-                         monthly_summary=monthly_summary,
-                         total_expenses=total_expenses,
-                         categories=categories,
+    return render_template('dashboard.html',
+                         monthly_total=stats['monthly_total'],
+                         total_expenses=stats['total_expenses'],
+                         average_expense=stats['average_expense'],
+                         categories=category_catalog.all(),
                          current_month=now.strftime('%B'),
-                         current_year=current_year)
+                         current_year=now.year)
+
+
+@main_bp.route('/dashboard/recent')
+@login_required
+@conditional_get(_dashboard_versions)
+def dashboard_recent():
+    """Recent expenses table fragment for the dashboard"""
+    recent_expenses = Expense.for_user(current_user.id)\
+        .order_by(Expense.created_at.desc()).limit(10).all()
+    return render_template('partials/recent_expenses.html', recent_expenses=recent_expenses)
+
+
+@main_bp.route('/dashboard/summary')
+@login_required
+@conditional_get(_dashboard_versions, vary=lambda: datetime.now().strftime('%Y-%m'))
+def dashboard_summary():
+    """Current month's spending by category fragment for the dashboard"""
+    now = datetime.now()
+    monthly_summary = Expense.get_monthly_summary(current_user.id, now.year, now.month)
+    return render_template('partials/category_summary.html',
+                         labels=[row.category for row in monthly_summary],
+                         totals=[float(row.total) for row in monthly_summary])
 
 
 @main_bp.route('/expenses')
 @login_required
 def expenses():
     """Expenses list page with filtering and search"""
-    categories = Category.query.all()
+    categories = category_catalog.all()
     return render_template('expenses.html', categories=categories)
 
 
 @main_bp.route('/analytics')
 @login_required
+@prefer_replica
 def analytics():
     """Analytics page with charts and reports"""
     # Get current year data
@@ -82,16 +94,17 @@ def analytics():
     top_categories = db.session.query(
         Category.name.label('category'),
         Category.color.label('color'),
-        func.sum(Expense.amount).label('total'),
-        func.count(Expense.id).label('count')
-    ).join(Category).filter(
-        Expense.user_id == current_user.id
+        func.sum(ExpenseRollup.total).label('total'),
+        func.sum(ExpenseRollup.count).label('count')
+    ).join(Category, ExpenseRollup.category_id == Category.id).filter(
+        ExpenseRollup.user_id == current_user.id
     ).group_by(Category.name, Category.color)\
-     .order_by(func.sum(Expense.amount).desc()).limit(10).all()
+     .order_by(func.sum(ExpenseRollup.total).desc()).limit(10).all()
     
+    # Rows are passed as dicts so the template can serialize them with tojson
     return render_template('analytics.html',
-                         yearly_summary=yearly_summary,
-                         top_categories=top_categories,
+                         yearly_summary=[row._asdict() for row in yearly_summary],
+                         top_categories=[row._asdict() for row in top_categories],
                          current_year=current_year)
 
 
@@ -99,7 +112,7 @@ def analytics():
 @login_required
 def categories():
     """Categories management page"""
-    categories = Category.query.all()
+    categories = category_catalog.all()
     return render_template('categories.html', categories=categories)
 
 
@@ -0,0 +1,49 @@
+"""
+Session that can route read-only queries to a replica database
+"""
+from functools import wraps
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+# Bind key of the optional read-only database in SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to the replica bind when the session prefers it
+
+    A session prefers the replica once ``session.info['prefer_replica']`` is
+    set (see ``prefer_replica``). Writes, and every read after the session
+    has flushed a write, stay on the primary so a request always reads its
+    own writes. Without a replica bind this behaves like the stock session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and isinstance(clause, Select)
+                and self.info.get('prefer_replica') and not self.info.get('has_written')):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _stick_to_primary(session, flush_context):
+    session.info['has_written'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _stick_to_primary_after_bulk_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['has_written'] = True
+
+
+def prefer_replica(view):
+    """Decorate a read-only view so its queries use the replica when configured"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from app import db
+        db.session.info['prefer_replica'] = True
+        return view(*args, **kwargs)
+    return wrapper
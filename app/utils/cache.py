@@ -0,0 +1,87 @@
+"""
+In-process caches validated by data versions or expiry times
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from weakref import WeakSet
+
+
+class VersionedCache:
+    """Bounded LRU cache whose entries are only valid for a given version
+
+    Callers look entries up with the current version of the data they were
+    computed from; a bumped version makes the old entry a miss, so nothing
+    has to be invalidated explicitly.
+    """
+    
+    _instances = WeakSet()
+    
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        VersionedCache._instances.add(self)
+    
+    def get(self, key, version):
+        """Get the cached value for key at version, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key, version, value):
+        """Store value for key at version, evicting the least recently used entry"""
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key):
+        """Drop the entry for key, if any"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+    
+    @classmethod
+    def clear_all(cls):
+        """Drop the entries of every cache, e.g. when switching databases"""
+        for cache in list(cls._instances):
+            cache.clear()
+
+
+class TTLCache(VersionedCache):
+    """Bounded LRU cache whose entries expire a fixed time after being stored
+
+    For data that may be briefly stale but is too hot to re-validate on
+    every request. Writers in this process should delete entries they
+    change; other processes see the change once the entry expires.
+    """
+    
+    def __init__(self, maxsize=1024, ttl=30):
+        super().__init__(maxsize)
+        self.ttl = ttl
+    
+    def get(self, key):
+        """Get the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key, value, ttl=None):
+        """Store value for key for ``ttl`` seconds (defaults to the cache's ttl)"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        super().set(key, expires_at, value)
@@ -0,0 +1,55 @@
+"""
+Conditional GET support (ETag / Last-Modified) driven by data versions
+"""
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from app.models.version import DataVersion
+
+
+def conditional_get(version_keys, vary=None):
+    """
+    Answer repeat GETs with 304 Not Modified before running the view
+    - version_keys: callable returning the DataVersion keys the response depends on
+    - vary: optional callable returning extra text that changes the response
+      (e.g. the current month for time-dependent summaries)
+
+    The ETag hashes the keys, their versions and the request's path and query
+    string, so checking it costs a single lookup of the version rows.
+    If-Modified-Since alone never produces a 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            keys = sorted(version_keys())
+            versions = DataVersion.get_many(keys)
+            
+            validator = [request.full_path]
+            validator += [f'{key}={versions[key].version if key in versions else 0}' for key in keys]
+            if vary is not None:
+                validator.append(str(vary()))
+            etag = hashlib.sha1('|'.join(validator).encode()).hexdigest()
+            
+            last_modified = max((row.updated_at for row in versions.values()), default=None)
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0)
+            
+            # Only the ETag is validated: If-Modified-Since has one-second
+            # resolution and cannot see what ``vary`` adds, so it could
+            # confirm a stale copy. Last-Modified is still sent for clients.
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Let browsers keep the body but revalidate it on every request
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
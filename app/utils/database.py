@@ -0,0 +1,98 @@
+"""
+Database engine profiles: connection pragmas and pool settings per deployment
+"""
+from sqlalchemy import and_, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+PROFILES = ('default', 'production')
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured DATABASE_PROFILE
+
+    Server databases in the production profile get a sized connection pool
+    that checks connections before use and recycles them before the server
+    (or a proxy in between) drops idle ones. SQLite keeps SQLAlchemy's pool
+    defaults; it is tuned with pragmas on connect instead.
+    """
+    profile = config['DATABASE_PROFILE']
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown DATABASE_PROFILE {profile!r}; expected one of {PROFILES}')
+
+    if profile == 'default' or config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return {}
+
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+
+def upsert(connection, table, values, update):
+    """Insert the row ``values`` or, if its primary key exists, apply ``update`` to it
+
+    ``update`` maps column names to expressions over the existing row. SQLite
+    and PostgreSQL do this in one INSERT ... ON CONFLICT statement, so two
+    transactions writing a new key at once cannot both try to insert it.
+    Other backends update first and insert under a savepoint, retrying the
+    update when a concurrent insert won.
+    """
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite if dialect == 'sqlite' else postgresql).insert(table).values(**values)
+        connection.execute(insert.on_conflict_do_update(
+            index_elements=list(table.primary_key.columns), set_=update
+        ))
+        return
+
+    key = and_(*(column == values[column.name] for column in table.primary_key.columns))
+    if connection.execute(table.update().where(key).values(update)).rowcount:
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(table.insert().values(**values))
+    except IntegrityError:
+        connection.execute(table.update().where(key).values(update))
+
+
+def sqlite_pragmas(config):
+    """PRAGMA statements run on every new SQLite connection in the production profile
+
+    WAL lets readers proceed while a write is in progress, and with
+    synchronous=NORMAL a commit appends to the WAL without an fsync (the
+    database stays consistent; a power loss may drop the last commits).
+    busy_timeout makes writers wait for the lock instead of failing with
+    "database is locked".
+    """
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA busy_timeout={config["SQLITE_BUSY_TIMEOUT"]}',
+        # Negative cache_size is in KiB rather than pages
+        f'PRAGMA cache_size=-{config["SQLITE_CACHE_SIZE_KB"]}',
+        f'PRAGMA mmap_size={config["SQLITE_MMAP_SIZE"]}',
+    ]
+
+
+def init_app(app):
+    """Install the profile's connect hooks on every engine of the app"""
+    if app.config['DATABASE_PROFILE'] != 'production':
+        return
+
+    pragmas = sqlite_pragmas(app.config)
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', set_pragmas)
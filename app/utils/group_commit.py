@@ -0,0 +1,107 @@
+"""
+Group commit: coalesce concurrent small writes into one transaction
+"""
+import os
+import queue
+import time
+from concurrent.futures import Future
+from threading import Lock, Thread
+from app import db
+
+
+class GroupCommitWriter:
+    """A single writer thread that commits queued writes in batches
+
+    Each write is a callable run inside the writer's transaction; whatever
+    it returns becomes its future's result once the batch has committed.
+    The writer waits up to ``window`` seconds after the first write of a
+    batch for more to arrive, so N concurrent requests share one commit
+    (and one fsync) instead of paying for N. If a batch fails, its writes
+    are retried one per transaction so only the failing write reports an
+    error.
+    """
+
+    def __init__(self, app, window=0.005, max_batch=256):
+        self.app = app
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, write):
+        """Queue ``write`` and return a Future for its result"""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((future, write))
+        return future
+
+    def _ensure_thread(self):
+        # Started lazily, and again in a forked child, which does not
+        # inherit the parent's threads
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return [(future, write) for future, write in batch if future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = []
+                try:
+                    batch = self._next_batch()
+                    if batch:
+                        self._commit(batch)
+                except Exception as e:
+                    # Keep the writer alive; fail whatever this batch left unanswered
+                    self.app.logger.exception('Group commit batch failed')
+                    for future, write in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                try:
+                    db.session.remove()
+                except Exception:
+                    self.app.logger.exception('Group commit could not reset its session')
+
+    def _commit(self, batch):
+        results = []
+        try:
+            for future, write in batch:
+                results.append(write())
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0][0].set_exception(e)
+            else:
+                for item in batch:
+                    self._commit([item])
+            return
+
+        for (future, write), result in zip(batch, results):
+            future.set_result(result)
+
+
+def init_app(app):
+    """Create the app's writer when GROUP_COMMIT is enabled"""
+    if app.config['GROUP_COMMIT']:
+        app.extensions['group_commit'] = GroupCommitWriter(
+            app,
+            window=app.config['GROUP_COMMIT_WINDOW_MS'] / 1000,
+            max_batch=app.config['GROUP_COMMIT_MAX_BATCH']
+        )
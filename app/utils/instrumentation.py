@@ -0,0 +1,190 @@
+"""
+Per-request SQL instrumentation: Server-Timing, slow-query log and /metrics
+"""
+import hmac
+import time
+from threading import Lock
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+from app import db
+
+# Upper bounds (seconds) of the histogram buckets exposed on /metrics
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestStats:
+    """Statements run while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.db_time = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+
+    def add(self, statement, elapsed):
+        self.count += 1
+        self.db_time += elapsed
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+            self.slowest_statement = statement
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values"""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Per-endpoint counters and histograms of this process, in Prometheus text format
+
+    Each worker process keeps its own numbers; scrape every worker (or sum
+    them in the monitoring system) when running more than one.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.requests = {}
+        self.statements = {}
+        self.slow_statements = {}
+        self.request_seconds = {}
+        self.db_seconds = {}
+
+    def record_request(self, endpoint, method, status, elapsed, stats):
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.statements[endpoint] = self.statements.get(endpoint, 0) + stats.count
+            self.request_seconds.setdefault(endpoint, Histogram()).observe(elapsed)
+            self.db_seconds.setdefault(endpoint, Histogram()).observe(stats.db_time)
+
+    def record_slow_statement(self, endpoint):
+        with self._lock:
+            self.slow_statements[endpoint] = self.slow_statements.get(endpoint, 0) + 1
+
+    def render(self):
+        """The exposition text for a /metrics scrape"""
+        lines = []
+
+        def counter(name, help_text, values, labels):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for key, value in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                lines.append(f'{name}{_labels(zip(labels, key))} {value}')
+
+        def histogram(name, help_text, values):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for endpoint, histogram in sorted(values.items()):
+                for bound, count in zip(BUCKETS, histogram.buckets):
+                    lines.append(f'{name}_bucket{_labels([("endpoint", endpoint), ("le", bound)])} {count}')
+                lines.append(f'{name}_bucket{_labels([("endpoint", endpoint), ("le", "+Inf")])} {histogram.count}')
+                lines.append(f'{name}_sum{_labels([("endpoint", endpoint)])} {histogram.sum}')
+                lines.append(f'{name}_count{_labels([("endpoint", endpoint)])} {histogram.count}')
+
+        with self._lock:
+            counter('http_requests_total', 'Requests handled.', self.requests,
+                    ('endpoint', 'method', 'status'))
+            histogram('http_request_duration_seconds', 'Time to produce the response.',
+                      self.request_seconds)
+            counter('db_statements_total', 'SQL statements executed by requests.', self.statements,
+                    ('endpoint',))
+            histogram('db_request_duration_seconds', 'Time per request spent in SQL statements.',
+                      self.db_seconds)
+            counter('db_slow_statements_total', 'SQL statements over SLOW_QUERY_MS.',
+                    self.slow_statements, ('endpoint',))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(pairs):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def _endpoint():
+    return (request.endpoint or 'unmatched') if has_request_context() else None
+
+
+def init_app(app):
+    """Time every statement on the app's engines and report them per request
+
+    Statements run outside a request (such as the group-commit writer's
+    batches) are only checked against the slow-query threshold.
+    """
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+
+    metrics = app.extensions['metrics'] = Metrics()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        stats = g.get('sql_stats') if has_request_context() else None
+        if stats is not None:
+            stats.add(statement, elapsed)
+        slow_query = app.config['SLOW_QUERY_MS']
+        if slow_query and elapsed * 1000 >= slow_query:
+            endpoint = _endpoint()
+            metrics.record_slow_statement(endpoint or 'none')
+            app.logger.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000, endpoint or '-',
+                               ' '.join(statement.split()))
+
+    def handle_error(conn_context):
+        # A failed statement never reaches after_cursor_execute
+        started = conn_context.connection.info.get('query_started') if conn_context.connection else None
+        if started:
+            started.pop()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+            event.listen(engine, 'handle_error', handle_error)
+
+    @app.before_request
+    def start_request_stats():
+        g.sql_stats = RequestStats()
+
+    @app.after_request
+    def report_request_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        # Statements a streamed body runs after this point are not counted
+        elapsed = time.perf_counter() - stats.started
+        response.headers.add('Server-Timing', f'db;dur={stats.db_time * 1000:.1f};desc="{stats.count} queries"')
+        response.headers.add('Server-Timing', f'db-slowest;dur={stats.slowest * 1000:.1f}')
+        response.headers.add('Server-Timing', f'app;dur={elapsed * 1000:.1f}')
+        metrics.record_request(_endpoint(), request.method, response.status_code, elapsed, stats)
+        if stats.slowest_statement is not None:
+            app.logger.debug('%s: %d queries, %.1f ms in SQL, slowest %.1f ms: %s', _endpoint(),
+                             stats.count, stats.db_time * 1000, stats.slowest * 1000,
+                             stats.slowest_statement)
+        return response
+
+    def metrics_view():
+        # Not served at all until a scrape token is configured
+        token = app.config['METRICS_TOKEN']
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(401)
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
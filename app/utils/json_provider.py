@@ -0,0 +1,72 @@
+"""
+JSON provider that serializes dates and Decimals itself, using orjson when installed
+"""
+import dataclasses
+import uuid
+from datetime import date
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    """Convert the values json (or orjson) cannot serialize on its own"""
+    if isinstance(value, Decimal):
+        return float(value)
+    # Also covers datetime; orjson formats both without calling this
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, backed by orjson when it is installed
+
+    Dates and datetimes become ISO 8601 strings and Decimals become numbers,
+    so models can hand their column values over unconverted. Keys keep their
+    insertion order. Without orjson (or for json.dumps options it has no
+    equivalent for) the standard library encoder produces the same output.
+    """
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and kwargs.keys() <= {'separators', 'indent'} and kwargs.get('indent') in (None, 2):
+            option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if kwargs.get('indent') else 0)
+            try:
+                return orjson.dumps(obj, default=_default, option=option).decode()
+            except orjson.JSONEncodeError:
+                # e.g. integers wider than 64 bits; json.dumps handles or reports them
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is not None:
+            obj = self._prepare_response_obj(args, kwargs)
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+            if (self.compact is None and self._app.debug) or self.compact is False:
+                option |= orjson.OPT_INDENT_2
+            try:
+                # Bytes go straight into the response without a str round trip
+                return self._app.response_class(orjson.dumps(obj, default=_default, option=option),
+                                                mimetype=self.mimetype)
+            except orjson.JSONEncodeError:
+                pass
+        return super().response(*args, **kwargs)
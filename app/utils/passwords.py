@@ -0,0 +1,75 @@
+"""
+Password hashing on a bounded worker pool with a configurable bcrypt cost
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from flask import current_app
+from app import bcrypt
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool's queue is full; the request should be retried"""
+
+
+class HashingPool:
+    """Runs bcrypt on a fixed number of threads with a cap on waiting jobs
+
+    bcrypt releases the GIL while hashing, so the workers use spare cores
+    without blocking other requests. Requests past ``workers + queue_depth``
+    are rejected instead of piling up behind a login spike.
+    """
+
+    def __init__(self, workers, queue_depth):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = BoundedSemaphore(workers + queue_depth)
+
+    def run(self, func, *args):
+        """Run func(*args) on the pool and wait for the result"""
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy('Too many password checks in progress')
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future.result()
+
+    def shutdown(self):
+        """Stop the worker threads once queued jobs finish"""
+        self._executor.shutdown(wait=True)
+
+
+def init_app(app):
+    """Create the app's hashing pool from PASSWORD_HASH_WORKERS/PASSWORD_HASH_QUEUE"""
+    app.extensions['password_hashing'] = HashingPool(
+        app.config['PASSWORD_HASH_WORKERS'],
+        app.config['PASSWORD_HASH_QUEUE']
+    )
+
+
+def _pool():
+    return current_app.extensions['password_hashing']
+
+
+def hash_password(password):
+    """Hash a password at the configured BCRYPT_LOG_ROUNDS cost"""
+    rounds = current_app.config['BCRYPT_LOG_ROUNDS']
+    return _pool().run(bcrypt.generate_password_hash, password, rounds).decode('utf-8')
+
+
+def check_password(password_hash, password):
+    """Check a password against a stored bcrypt hash"""
+    return _pool().run(bcrypt.check_password_hash, password_hash, password)
+
+
+def hash_cost(password_hash):
+    """Get the cost (log2 rounds) a bcrypt hash was made with, e.g. 12 for '$2b$12$...'"""
+    return int(password_hash.split('$')[2])
+
+
+def needs_rehash(password_hash):
+    """Whether a hash was made with a different cost than BCRYPT_LOG_ROUNDS"""
+    return hash_cost(password_hash) != current_app.config['BCRYPT_LOG_ROUNDS']
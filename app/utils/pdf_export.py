@@ -0,0 +1,256 @@
+"""
+PDF statement export rendered in a bounded pool of worker processes
+"""
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from threading import Lock
+from flask import current_app, has_app_context
+from werkzeug.datastructures import MultiDict
+from app import db
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+ROWS_PER_PAGE = 40
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#007bff')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('ALIGN', (3, 0), (3, -1), 'RIGHT'),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f2f2f2')]),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+])
+
+_executor = None
+_executor_lock = Lock()
+_worker_app = None
+
+
+def new_job_id():
+    """Generate an id for an export job"""
+    return uuid.uuid4().hex
+
+
+def export_dir():
+    """Directory holding finished exports and their status files"""
+    path = current_app.config.get('PDF_EXPORT_DIR') or os.path.join(current_app.instance_path, 'exports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def pdf_path(directory, job_id):
+    """Path of a job's finished PDF"""
+    return os.path.join(directory, f'{job_id}.pdf')
+
+
+def write_status(directory, job_id, **status):
+    """Atomically replace a job's status file so readers never see half a write"""
+    status['updated_at'] = time.time()
+    path = os.path.join(directory, f'{job_id}.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(status, f)
+    os.replace(path + '.tmp', path)
+
+
+def read_status(directory, job_id):
+    """Read a job's status, or None for unknown (or malformed) job ids"""
+    if not JOB_ID_PATTERN.match(job_id):
+        return None
+    try:
+        with open(os.path.join(directory, f'{job_id}.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_expired(directory, max_age):
+    """Delete exports and status files older than ``max_age`` seconds"""
+    cutoff = time.time() - max_age
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def render_statement(path, title, rows, total, on_progress=None):
+    """Draw ``rows`` into a PDF one page at a time
+
+    Rows need date, title, category and amount attributes and are consumed
+    lazily, so only a page's worth is held in memory. ``on_progress(rows_done)``
+    is called after each page. Returns (row count, amount total).
+    """
+    pdf = canvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    header = ['Date', 'Title', 'Category', 'Amount']
+    done = 0
+    amount_total = 0
+    page = []
+
+    def draw_page(page_rows):
+        pdf.setFont('Helvetica-Bold', 14)
+        pdf.drawString(40, height - 50, title)
+        pdf.setFont('Helvetica', 8)
+        pdf.drawRightString(width - 40, height - 50, f'{total} expenses')
+
+        table = Table([header] + page_rows, colWidths=[70, 250, 130, 80])
+        table.setStyle(_TABLE_STYLE)
+        table_width, table_height = table.wrapOn(pdf, width - 80, height - 100)
+        table.drawOn(pdf, 40, height - 70 - table_height)
+        return table_height
+
+    table_height = 0
+    for row in rows:
+        if len(page) == ROWS_PER_PAGE:
+            # Only start a new page once there is something to put on it
+            pdf.showPage()
+            page = []
+
+        page.append([
+            row.date.isoformat(),
+            row.title if len(row.title) <= 60 else row.title[:57] + '...',
+            row.category or 'Uncategorized',
+            f'${row.amount:,.2f}'
+        ])
+        amount_total += row.amount
+        done += 1
+
+        if len(page) == ROWS_PER_PAGE:
+            table_height = draw_page(page)
+            if on_progress:
+                on_progress(done)
+
+    if len(page) < ROWS_PER_PAGE:
+        table_height = draw_page(page)
+    pdf.setFont('Helvetica-Bold', 10)
+    pdf.drawString(40, height - 90 - table_height, f'Total: ${amount_total:,.2f}')
+    pdf.save()
+
+    if on_progress:
+        on_progress(done)
+    return done, amount_total
+
+
+def _init_worker(database_url):
+    """Give each worker process its own app (and engine) for the export database"""
+    global _worker_app
+    from app import create_app
+
+    os.environ['DATABASE_URL'] = database_url
+    _worker_app = create_app()
+
+
+def run_export_job(directory, job_id, user_id, filters, title):
+    """Render one user's statement; runs in a worker process (or inline)
+
+    Progress and the final outcome are reported through the job's status file.
+    """
+    if has_app_context():
+        return _run_export(directory, job_id, user_id, filters, title)
+    with _worker_app.app_context():
+        return _run_export(directory, job_id, user_id, filters, title)
+
+
+def _run_export(directory, job_id, user_id, filters, title):
+    from app.routes.api import _export_query, EXPORT_BATCH_SIZE
+
+    status = {'user_id': user_id, 'state': 'running', 'rows_done': 0}
+    # Read-only, so it can run against the replica when one is configured
+    db.session.info['prefer_replica'] = True
+    try:
+        query = _export_query(user_id, MultiDict(filters))
+        status['rows_total'] = query.order_by(None).count()
+        write_status(directory, job_id, **status)
+
+        def progress(done):
+            status['rows_done'] = done
+            write_status(directory, job_id, **status)
+
+        path = pdf_path(directory, job_id)
+        render_statement(
+            path + '.part', title, query.yield_per(EXPORT_BATCH_SIZE),
+            status['rows_total'], progress
+        )
+        os.replace(path + '.part', path)
+        status['state'] = 'done'
+    except Exception as e:
+        status.update(state='failed', error=str(e))
+
+    write_status(directory, job_id, **status)
+    return status['state']
+
+
+def submit_export(job_id, user_id, filters, title):
+    """Queue an export job and record it as queued
+
+    With PDF_EXPORT_WORKERS set to 0 the job runs inline, which is meant for
+    tests and debugging only. Raises BrokenProcessPool (with the job marked
+    failed) when the worker pool has died; the next export starts a new one.
+    """
+    directory = export_dir()
+    remove_expired(directory, current_app.config.get('PDF_EXPORT_RETENTION', 86400))
+    write_status(directory, job_id, user_id=user_id, state='queued', rows_done=0)
+
+    workers = current_app.config.get('PDF_EXPORT_WORKERS', 2)
+    if workers <= 0:
+        run_export_job(directory, job_id, user_id, filters, title)
+        return
+
+    executor = _get_executor(workers)
+    try:
+        future = executor.submit(run_export_job, directory, job_id, user_id, filters, title)
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        executor.shutdown(wait=False, cancel_futures=True)
+        write_status(directory, job_id, user_id=user_id, state='failed', rows_done=0,
+                     error='Export workers are unavailable')
+        raise
+
+    def check_outcome(future):
+        # The job reports its own failures; this covers workers that died
+        # (or never started) before they could
+        error = future.exception() if not future.cancelled() else 'Export was cancelled'
+        if error is None:
+            return
+        if isinstance(error, BrokenProcessPool):
+            # Runs in the pool's manager thread, which holds the lock
+            # shutdown() takes; a broken pool winds itself down anyway
+            _discard_executor(executor)
+        write_status(directory, job_id, user_id=user_id, state='failed', rows_done=0,
+                     error=str(error) or 'Export worker failed')
+
+    future.add_done_callback(check_outcome)
+
+
+def _discard_executor(executor):
+    """Forget a broken pool so the next export starts a fresh one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned (not forked) workers never inherit the web process's
+            # open connections or lock state
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(db.engine.url.render_as_string(hide_password=False),)
+            )
+        return _executor
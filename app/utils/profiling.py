@@ -0,0 +1,145 @@
+"""
+On-demand profiling of single requests for admins
+"""
+import cProfile
+import os
+import sys
+import time
+import uuid
+from threading import Event, Lock, Thread, get_ident
+from flask import current_app, g, request
+from flask_login import current_user
+
+# Request header (or query parameter) asking for the request to be profiled
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+
+# cProfile can only be active in one thread at a time
+_profiler_lock = Lock()
+
+
+class StackSampler(Thread):
+    """Samples one thread's call stack at a fixed interval
+
+    The counts are kept per stack in collapsed form (``outer;inner count``),
+    which flamegraph.pl, speedscope and similar tools read directly.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stopped = Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{getattr(code, "co_qualname", code.co_name)}')
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.stacks.items()))
+
+
+def profile_dir():
+    """Directory holding saved profiles"""
+    path = current_app.config.get('PROFILE_DIR') or os.path.join(current_app.instance_path, 'profiles')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def remove_oldest(directory, keep):
+    """Keep only the newest ``keep`` profiles (each a .prof and a .collapsed file)"""
+    profiles = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith('.prof')),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in profiles[:max(len(profiles) - keep, 0)]:
+        for path in (entry.path, entry.path[:-len('.prof')] + '.collapsed'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _requested():
+    return request.headers.get(PROFILE_HEADER) == '1' or request.args.get(PROFILE_PARAM) == '1'
+
+
+def _start_profile():
+    if not _requested() or not current_user.is_authenticated:
+        return
+    if current_user.username not in current_app.config['PROFILING_ADMINS']:
+        return
+    # Another request is being profiled; this one runs normally
+    if not _profiler_lock.acquire(blocking=False):
+        return
+
+    sampler = StackSampler(get_ident(), current_app.config['PROFILE_SAMPLE_INTERVAL_MS'] / 1000)
+    profiler = cProfile.Profile()
+    g.profile = (profiler, sampler, request.endpoint or 'unmatched')
+    sampler.start()
+    profiler.enable()
+
+
+def _finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+
+    profile_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{profile[2]}-{uuid.uuid4().hex[:8]}'
+    directory = profile_dir()
+    keep = current_app.config['PROFILE_MAX_FILES']
+
+    def save():
+        # Runs once the body has been sent, so streamed responses are covered
+        profiler, sampler, endpoint = profile
+        profiler.disable()
+        sampler.stop()
+        _profiler_lock.release()
+        profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+        with open(os.path.join(directory, f'{profile_id}.collapsed'), 'w') as f:
+            f.write(sampler.collapsed())
+        remove_oldest(directory, keep)
+
+    response.call_on_close(save)
+    response.headers['X-Profile-Id'] = profile_id
+    return response
+
+
+def _abandon_profile(error=None):
+    """Stop a profile that after_request never saw (an exception propagated)
+
+    Otherwise the profiler would stay enabled on this thread and the lock
+    held, turning profiling off for the rest of the process.
+    """
+    profile = g.pop('profile', None)
+    if profile is None:
+        return
+    profiler, sampler, endpoint = profile
+    profiler.disable()
+    sampler.stop()
+    _profiler_lock.release()
+
+
+def init_app(app):
+    """Install the profiling hooks only when PROFILING is enabled
+
+    With profiling off nothing is registered, so requests pay nothing for it.
+    """
+    if not app.config['PROFILING']:
+        return
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abandon_profile)
@@ -1,6 +1,7 @@
 """
 Validation utilities for forms and API requests
 """
+import math
 import re
 from app.models.user import User
 
@@ -118,7 +119,9 @@ def validate_expense(title, amount, category_id, date_str=None):
     else:
         try:
             amount_float = float(amount)
-            if amount_float <= 0:
+            if not math.isfinite(amount_float):
+                errors.append('Amount must be a valid number')
+            elif amount_float <= 0:
                 errors.append('Amount must be greater than 0')
             elif amount_float > 999999.99:
                 errors.append('Amount must be less than $1,000,000')
@@ -136,7 +139,7 @@ def validate_expense(title, amount, category_id, date_str=None):
     if date_str:
         try:
             datetime.strptime(date_str, '%Y-%m-%d')
-        except ValueError:
+        except (ValueError, TypeError):
             errors.append('Invalid date format')
     
     return errors
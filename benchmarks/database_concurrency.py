@@ -0,0 +1,110 @@
+"""
+Benchmark concurrent reads and writes against SQLite per DATABASE_PROFILE
+
+Usage: python benchmarks/database_concurrency.py [--writers 4] [--readers 4] [--seconds 5]
+
+Each profile gets a fresh database file. Writer threads insert expenses
+(one commit each, as POST /api/expenses does) while reader threads run the
+expense listing query. Reports throughput, read latency and lock errors.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from app import create_app, db
+from app.models.user import User
+from app.models.expense import Expense, Category
+
+
+def run_profile(profile, writers, readers, seconds):
+    """Run the mixed workload against a fresh database using ``profile``"""
+    directory = tempfile.mkdtemp(prefix=f'bench-{profile}-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(directory, "bench.db")}'
+    os.environ['DATABASE_PROFILE'] = profile
+    # Lock waits make statements slow on purpose; keep the log out of the report
+    os.environ['SLOW_QUERY_MS'] = '0'
+    app = create_app()
+    
+    with app.app_context():
+        db.create_all()
+        user = User('bench', 'bench@example.com', 'BenchPass123', 'Bench', 'User')
+        category = Category(name='Bench', color='#007bff')
+        db.session.add_all([user, category])
+        db.session.commit()
+        user_id, category_id = user.id, category.id
+    
+    deadline = time.perf_counter() + seconds
+    results = {'writes': 0, 'reads': 0, 'errors': 0, 'read_latencies': []}
+    lock = threading.Lock()
+    
+    def writer():
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                try:
+                    db.session.add(Expense(title='Bench', amount=1, date=date.today(),
+                                           user_id=user_id, category_id=category_id))
+                    db.session.commit()
+                    with lock:
+                        results['writes'] += 1
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        results['errors'] += 1
+    
+    def reader():
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    Expense.for_user(user_id).order_by(Expense.date.desc()).limit(20).all()
+                    db.session.rollback()
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        results['errors'] += 1
+                    continue
+                with lock:
+                    results['reads'] += 1
+                    results['read_latencies'].append(time.perf_counter() - start)
+    
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    latencies = sorted(results['read_latencies']) or [0]
+    return {
+        'writes/s': results['writes'] / seconds,
+        'reads/s': results['reads'] / seconds,
+        'read p95 ms': latencies[int(len(latencies) * 0.95) - 1] * 1000 if len(latencies) > 1 else 0,
+        'lock errors': results['errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare SQLite concurrency across engine profiles')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--profiles', nargs='+', default=['default', 'production'])
+    args = parser.parse_args()
+    
+    print(f'{args.writers} writers, {args.readers} readers, {args.seconds:g}s per profile')
+    print(f'{"profile":<12}{"writes/s":>10}{"reads/s":>10}{"read p95 ms":>13}{"lock errors":>13}')
+    for profile in args.profiles:
+        result = run_profile(profile, args.writers, args.readers, args.seconds)
+        print(f'{profile:<12}{result["writes/s"]:>10.1f}{result["reads/s"]:>10.1f}'
+              f'{result["read p95 ms"]:>13.1f}{result["lock errors"]:>13}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark sustained expense inserts with and without group commit
+
+Usage: python benchmarks/group_commit.py [--clients 16] [--seconds 5]
+
+Each mode gets a fresh SQLite database. ``--clients`` threads POST to
+/api/expenses through the Flask test client as fast as they can; the
+report shows committed inserts per second and the mean request latency.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.user import User
+from app.models.expense import Expense, Category
+
+
+def run_mode(group_commit, clients, seconds, profile):
+    """Insert expenses from concurrent clients for ``seconds``; returns (inserts/s, ms)"""
+    directory = tempfile.mkdtemp(prefix='bench-group-commit-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(directory, "bench.db")}'
+    os.environ['DATABASE_PROFILE'] = profile
+    os.environ['GROUP_COMMIT'] = '1' if group_commit else '0'
+    os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+    # Lock waits make statements slow on purpose; keep the log out of the report
+    os.environ['SLOW_QUERY_MS'] = '0'
+    app = create_app()
+    
+    with app.app_context():
+        db.create_all()
+        category = Category(name='Bench', color='#007bff')
+        db.session.add_all([User('bench', 'bench@example.com', 'BenchPass123', 'Bench', 'User'), category])
+        db.session.commit()
+        category_id = category.id
+    
+    latencies = []
+    lock = threading.Lock()
+    ready = threading.Barrier(clients + 1)
+    
+    def client_loop():
+        client = app.test_client()
+        client.post('/auth/login', json={'username': 'bench', 'password': 'BenchPass123'})
+        ready.wait()
+        deadline = time.perf_counter() + seconds
+        mine = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.post('/api/expenses', json={
+                'title': 'Bench', 'amount': 1, 'category_id': category_id, 'date': '2024-01-01'
+            })
+            if response.status_code == 201:
+                mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+    
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    for thread in threads:
+        thread.join()
+    
+    with app.app_context():
+        committed = Expense.query.count()
+    mean_ms = sum(latencies) / len(latencies) * 1000 if latencies else 0
+    return committed / seconds, mean_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare insert throughput with and without group commit')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--profile', default='default', help='DATABASE_PROFILE to run both modes with')
+    args = parser.parse_args()
+    
+    print(f'{args.clients} clients, {args.seconds:g}s per mode, {args.profile} database profile')
+    print(f'{"mode":<16}{"inserts/s":>11}{"mean ms":>10}')
+    for enabled in (False, True):
+        rate, mean_ms = run_mode(enabled, args.clients, args.seconds, args.profile)
+        print(f'{"group commit" if enabled else "commit per row":<16}{rate:>11.1f}{mean_ms:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark serializing a large expense listing to a JSON response
+
+Usage: python benchmarks/json_serialization.py [--expenses 10000] [--repeat 5]
+
+Builds in-memory expenses (no database) and times to_dict() plus the JSON
+response for: Flask's default provider with values converted in to_dict()
+(how the API worked before), the fast provider on the standard library,
+and the fast provider with orjson when it is installed.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from flask.json.provider import DefaultJSONProvider
+from app import create_app
+from app.models.expense import Expense, Category
+from app.utils import json_provider
+from app.utils.json_provider import FastJSONProvider
+
+
+def converted(expense):
+    """to_dict() as it was before the fast provider: every value pre-formatted"""
+    category = expense.category
+    return {
+        'id': expense.id,
+        'title': expense.title,
+        'description': expense.description,
+        'amount': float(expense.amount),
+        'date': expense.date.isoformat(),
+        'created_at': expense.created_at.isoformat(),
+        'updated_at': expense.updated_at.isoformat(),
+        'user_id': expense.user_id,
+        'category_id': expense.category_id,
+        'category': {
+            'id': category.id,
+            'name': category.name,
+            'description': category.description,
+            'color': category.color,
+            'created_at': category.created_at.isoformat()
+        }
+    }
+
+
+def make_expenses(count):
+    category = Category(id=1, name='Food & Dining', description='Restaurants and groceries',
+                        color='#FF6384', created_at=datetime(2024, 1, 1))
+    now = datetime(2024, 6, 1, 12, 0, 0, 123456)
+    return [
+        Expense(id=i, title=f'Expense {i}', description='Lunch with the team', amount=Decimal(f'{i % 500}.25'),
+                date=date(2024, 1, 1) + timedelta(days=i % 365), created_at=now, updated_at=now,
+                user_id=1, category_id=1, category=category)
+        for i in range(count)
+    ]
+
+
+def measure(app, provider, to_dict, expenses, repeat):
+    """Best-of-``repeat`` milliseconds for building the dicts and the response"""
+    app.json = provider
+    build, respond, size = [], [], 0
+    with app.test_request_context():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            payload = {'expenses': [to_dict(expense) for expense in expenses]}
+            built = time.perf_counter()
+            response = provider.response(payload)
+            done = time.perf_counter()
+            build.append((built - start) * 1000)
+            respond.append((done - built) * 1000)
+            size = len(response.get_data())
+    return min(build), min(respond), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON providers on an expense listing')
+    parser.add_argument('--expenses', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    expenses = make_expenses(args.expenses)
+    orjson = json_provider.orjson
+
+    modes = [('default provider', DefaultJSONProvider(app), converted)]
+    json_provider.orjson = None
+    modes.append(('fast provider, stdlib', FastJSONProvider(app), Expense.to_dict))
+    print(f'{args.expenses} expenses, best of {args.repeat}')
+    print(f'{"provider":<24}{"to_dict ms":>12}{"json ms":>10}{"total ms":>10}{"bytes":>11}')
+    results = [(name, *measure(app, provider, to_dict, expenses, args.repeat))
+               for name, provider, to_dict in modes]
+
+    json_provider.orjson = orjson
+    if orjson is not None:
+        results.append(('fast provider, orjson',
+                        *measure(app, FastJSONProvider(app), Expense.to_dict, expenses, args.repeat)))
+    else:
+        print('(orjson is not installed; pip install orjson to include it)')
+
+    for name, build, respond, size in results:
+        print(f'{name:<24}{build:>12.1f}{respond:>10.1f}{build + respond:>10.1f}{size:>11}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""
+Load test: concurrent virtual users running real sessions over HTTP
+
+Usage: python benchmarks/load_test.py [--users 20] [--seconds 30] [--mix browse]
+                                      [--expenses 100000] [--json results.json]
+       python benchmarks/load_test.py --url http://127.0.0.1:5000 ...
+
+Without ``--url`` it seeds a fresh SQLite database (benchmarks/seed.py) and
+serves the app from a separate process, so the load generator does not
+share the server's interpreter. With ``--url`` it drives an already running
+instance whose database was seeded by seed.py (users user1..userN).
+
+Every virtual user logs in (or registers, see ``--register``), loads its
+categories, then picks actions from the mix until time runs out. The report
+has per-endpoint latency percentiles and histograms, error rates and
+requests per second; ``--json`` writes it for comparing runs.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seed import seed, BENCH_PASSWORD, WORDS
+
+# Relative weights of each action per named mix
+MIXES = {
+    'browse': {'dashboard': 30, 'list': 35, 'search': 20, 'create': 10, 'export': 5},
+    'write': {'dashboard': 10, 'list': 20, 'search': 10, 'create': 55, 'export': 5},
+    'export': {'dashboard': 20, 'list': 20, 'search': 10, 'create': 10, 'export': 40},
+}
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+def parse_mix(value):
+    """A named mix or ``action=weight,...``"""
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(','):
+        action, _, weight = part.partition('=')
+        if action not in MIXES['browse']:
+            raise argparse.ArgumentTypeError(f'unknown action {action!r}')
+        mix[action] = float(weight or 1)
+    return mix
+
+
+class Stats:
+    """Thread-safe latency and error collection per endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, endpoint, elapsed, ok):
+        with self._lock:
+            entry = self.endpoints.setdefault(endpoint, {'latencies': [], 'errors': 0})
+            entry['latencies'].append(elapsed * 1000)
+            if not ok:
+                entry['errors'] += 1
+
+    def report(self, seconds):
+        """Summaries per endpoint plus a total row"""
+        def summarize(latencies, errors):
+            latencies = sorted(latencies)
+            histogram = [0] * (len(BUCKETS) + 1)
+            for latency in latencies:
+                histogram[next((i for i, bound in enumerate(BUCKETS) if latency <= bound), len(BUCKETS))] += 1
+
+            def percentile(p):
+                return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0
+
+            return {
+                'requests': len(latencies),
+                'errors': errors,
+                'error_rate': errors / len(latencies) if latencies else 0,
+                'rps': len(latencies) / seconds,
+                'p50_ms': percentile(0.50),
+                'p90_ms': percentile(0.90),
+                'p99_ms': percentile(0.99),
+                'max_ms': latencies[-1] if latencies else 0,
+                'histogram': {
+                    **{f'le_{bound}': count for bound, count in zip(BUCKETS, histogram)},
+                    'gt_last': histogram[-1]
+                },
+            }
+
+        with self._lock:
+            report = {name: summarize(entry['latencies'], entry['errors'])
+                      for name, entry in sorted(self.endpoints.items())}
+            report['total'] = summarize(
+                [latency for entry in self.endpoints.values() for latency in entry['latencies']],
+                sum(entry['errors'] for entry in self.endpoints.values())
+            )
+        return report
+
+
+class VirtualUser:
+    """One browser session: its own cookies, categories and random choices"""
+
+    def __init__(self, base_url, stats, number, seeded_users, register, mix, think):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.number = number
+        self.seeded_users = seeded_users
+        self.register = register
+        self.mix = mix
+        self.think = think
+        self.rng = random.Random(number)
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+        self.category_ids = []
+
+    def request(self, endpoint, path, body=None, method=None):
+        """Send one request, record it under ``endpoint`` and return (status, body)"""
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            request.add_header('Content-Type', 'application/json')
+
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        except OSError:
+            status, payload = 0, b''
+        self.stats.record(endpoint, time.perf_counter() - start, 200 <= status < 400)
+        return status, payload
+
+    def start_session(self):
+        if self.register:
+            name = f'load{os.getpid()}x{self.number}'
+            status, _ = self.request('POST /auth/register', '/auth/register', {
+                'username': name, 'email': f'{name}@example.com', 'password': BENCH_PASSWORD,
+                'confirm_password': BENCH_PASSWORD, 'first_name': 'Load', 'last_name': 'Test'
+            })
+        else:
+            username = f'user{self.number % self.seeded_users + 1}'
+            status, _ = self.request('POST /auth/login', '/auth/login',
+                                     {'username': username, 'password': BENCH_PASSWORD})
+        if status != 200:
+            return False
+
+        status, payload = self.request('GET /api/categories', '/api/categories')
+        if status == 200:
+            self.category_ids = [category['id'] for category in json.loads(payload)['categories']]
+        return bool(self.category_ids)
+
+    def dashboard(self):
+        # The page, then the two fragments its script loads
+        self.request('GET /dashboard', '/dashboard')
+        self.request('GET /dashboard/recent', '/dashboard/recent')
+        self.request('GET /dashboard/summary', '/dashboard/summary')
+
+    def list(self):
+        path = f'/api/expenses?page={self.rng.randint(1, 5)}'
+        if self.rng.random() < 0.3:
+            path += f'&category_id={self.rng.choice(self.category_ids)}'
+        self.request('GET /api/expenses', path)
+
+    def search(self):
+        self.request('GET /api/expenses?search', f'/api/expenses?search={self.rng.choice(WORDS)}')
+
+    def create(self):
+        self.request('POST /api/expenses', '/api/expenses', {
+            'title': f'Load test {self.rng.choice(WORDS)}',
+            'amount': round(self.rng.uniform(1, 250), 2),
+            'category_id': self.rng.choice(self.category_ids),
+            'date': (date.today() - timedelta(days=self.rng.randrange(90))).isoformat(),
+        })
+
+    def export(self):
+        start = (date.today() - timedelta(days=365)).isoformat()
+        self.request('GET /api/export/csv', f'/api/export/csv?start_date={start}')
+
+    def run(self, deadline):
+        if not self.start_session():
+            return
+        actions, weights = zip(*self.mix.items())
+        while time.perf_counter() < deadline:
+            getattr(self, self.rng.choices(actions, weights)[0])()
+            if self.think:
+                time.sleep(self.rng.uniform(0, 2 * self.think))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(database_url, port):
+    """Serve the app on ``port`` from a child process; returns the process"""
+    # The slow-query log would interleave with the report on the shared terminal
+    env = dict(os.environ, DATABASE_URL=database_url, SLOW_QUERY_MS='0')
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', str(port)], env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError('the app server did not start')
+
+
+def serve(port):
+    """Child process entry point: a threaded server like ``flask run``"""
+    from werkzeug.serving import run_simple
+    from app import create_app
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    run_simple('127.0.0.1', port, create_app(), threaded=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive concurrent user sessions against the app')
+    parser.add_argument('--url', help='target a running instance instead of starting one')
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='seconds over which users start')
+    parser.add_argument('--think', type=float, default=0.0, help='mean pause between actions (s)')
+    parser.add_argument('--mix', type=parse_mix, default='browse',
+                        help=f'one of {", ".join(MIXES)} or action=weight,... '
+                             f'(actions: {", ".join(MIXES["browse"])})')
+    parser.add_argument('--register', type=float, default=0.0,
+                        help='fraction of users that register instead of logging in')
+    parser.add_argument('--seeded-users', type=int, default=100)
+    parser.add_argument('--expenses', type=int, default=100000, help='rows to seed without --url')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        directory = tempfile.mkdtemp(prefix='bench-load-')
+        database_url = f'sqlite:///{os.path.join(directory, "bench.db")}'
+        seed(database_url, args.seeded_users, args.expenses)
+        port = free_port()
+        server = start_server(database_url, port)
+        base_url = f'http://127.0.0.1:{port}'
+
+    stats = Stats()
+    try:
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        rng = random.Random(0)
+        threads = []
+        for number in range(args.users):
+            user = VirtualUser(base_url, stats, number, args.seeded_users,
+                               rng.random() < args.register, args.mix, args.think)
+            thread = threading.Thread(target=user.run, args=(deadline,), daemon=True)
+            thread.start()
+            threads.append(thread)
+            if args.ramp_up:
+                time.sleep(args.ramp_up / args.users)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = stats.report(elapsed)
+    print(f'{args.users} users, {elapsed:.1f}s, mix {args.mix}')
+    print(f'{"endpoint":<28}{"requests":>9}{"rps":>8}{"errors":>8}{"p50 ms":>9}{"p90 ms":>9}'
+          f'{"p99 ms":>9}{"max ms":>9}')
+    for name, row in report.items():
+        print(f'{name:<28}{row["requests"]:>9}{row["rps"]:>8.1f}{row["error_rate"]:>8.1%}'
+              f'{row["p50_ms"]:>9.1f}{row["p90_ms"]:>9.1f}{row["p99_ms"]:>9.1f}{row["max_ms"]:>9.1f}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'config': {
+                    'url': args.url, 'users': args.users, 'seconds': args.seconds,
+                    'ramp_up': args.ramp_up, 'think': args.think, 'mix': args.mix,
+                    'register': args.register, 'expenses': None if args.url else args.expenses,
+                },
+                'elapsed': elapsed,
+                'histogram_buckets_ms': BUCKETS,
+                'endpoints': report,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark bcrypt hashing throughput at each cost factor
+
+Usage: python benchmarks/password_hashing.py [--costs 10 11 12] [--workers 2] [--seconds 2]
+
+For every cost it reports hashes per second on one thread and through the
+app's hashing pool with --workers threads, which is the ceiling for logins
+per second per process at that cost.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import bcrypt
+from app.utils.passwords import HashingPool
+
+
+def measure(hash_once, seconds, concurrency=1):
+    """Call hash_once from ``concurrency`` threads for ~seconds; returns hashes/sec"""
+    deadline = time.perf_counter() + seconds
+    
+    def loop():
+        count = 0
+        while time.perf_counter() < deadline:
+            hash_once()
+            count += 1
+        return count
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as callers:
+        total = sum(callers.map(lambda _: loop(), range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure bcrypt throughput per cost factor')
+    parser.add_argument('--costs', type=int, nargs='+', default=[10, 11, 12, 13])
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)))
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+    
+    pool = HashingPool(args.workers, queue_depth=args.workers)
+    print(f'{"cost":>4}  {"ms/hash":>8}  {"hash/s (1 thread)":>18}  {f"hash/s (pool of {args.workers})":>20}')
+    
+    for cost in args.costs:
+        def hash_once():
+            bcrypt.generate_password_hash('benchmark-password', cost)
+        
+        single = measure(hash_once, args.seconds)
+        pooled = measure(lambda: pool.run(hash_once), args.seconds, concurrency=args.workers)
+        print(f'{cost:>4}  {1000 / single:>8.1f}  {single:>18.1f}  {pooled:>20.1f}')
+    
+    pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Query-plan and latency benchmarks for the model and route functions
+
+Usage: python benchmarks/queries.py [--rows 1000 100000 1000000] [--users 100]
+                                    [--repeat 5] [--budget-scale 1.0] [--json results.json]
+
+For every data size it seeds a fresh SQLite database (benchmarks/seed.py),
+then times each case as the first seeded user and runs EXPLAIN QUERY PLAN on
+every SELECT it issued. A case fails when a plan scans a large table, misses
+the index it is expected to use, or its median latency is over budget
+(budgets are in milliseconds; scale them for slower machines). Exits
+non-zero when any case fails.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seed import seed, BENCH_PASSWORD
+
+# Plans must never walk these tables row by row
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(expenses|expense_rollups)\b')
+
+TODAY = date.today()
+LAST_YEAR = TODAY.year - 1
+
+# (name, url or callable, expected plan fragment or None, budget in ms)
+CASES = [
+    ('get_monthly_summary', lambda user_id: _model('get_monthly_summary', user_id, TODAY.year, TODAY.month),
+     'expense_rollups', 10),
+    ('get_yearly_summary', lambda user_id: _model('get_yearly_summary', user_id, LAST_YEAR),
+     'expense_rollups', 10),
+    ('get_expenses', '/api/expenses', 'idx_user', 50),
+    ('get_expenses category', '/api/expenses?category_id=3', 'idx_user_category', 50),
+    ('get_expenses search', '/api/expenses?search=coffee', 'expenses_fts', 50),
+    ('get_expenses dates', f'/api/expenses?start_date={LAST_YEAR}-03-01&end_date={LAST_YEAR}-03-31',
+     'idx_user_date_category_amount', 50),
+    ('get_expenses deep page', '/api/expenses?page=50', 'idx_user', 50),
+    ('get_expenses cursor', '/api/expenses?pagination=cursor&per_page=50', 'idx_user', 30),
+    ('get_summary_stats', '/api/stats/summary', 'expense_rollups', 20),
+    ('export_csv', '/api/export/csv?stream=1', 'idx_user_date_category_amount', 2000),
+]
+
+
+def _model(method, *args):
+    from app.models.expense import Expense
+    return getattr(Expense, method)(*args)
+
+
+def explain(db, statements):
+    """EXPLAIN QUERY PLAN every captured query; returns [(sql, [detail, ...])]"""
+    connection = db.session.connection()
+    plans = []
+    for statement, parameters in statements:
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+            plans.append((statement, [row[-1] for row in rows]))
+    db.session.rollback()
+    return plans
+
+
+def run_case(app, client, user_id, case, repeat):
+    """Time one case and check its query plans; returns a result dict"""
+    from sqlalchemy import event
+    from app import db
+    from app.utils.cache import VersionedCache
+
+    name, target, expected, budget = case
+
+    def call():
+        if callable(target):
+            with app.app_context():
+                target(user_id)
+                db.session.remove()
+        else:
+            response = client.get(target)
+            response.get_data()
+            assert response.status_code == 200, (name, response.status_code)
+
+    statements = []
+    with app.app_context():
+        record = lambda conn, cursor, statement, parameters, context, executemany: \
+            statements.append((statement, parameters))
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            VersionedCache.clear_all()
+            call()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        plans = explain(db, statements)
+        db.session.remove()
+
+    timings = []
+    for _ in range(repeat):
+        # Cold caches, so the numbers measure the queries rather than the caches
+        VersionedCache.clear_all()
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    details = [detail for statement, plan in plans for detail in plan]
+    problems = [f'full scan: {detail}' for detail in details if FULL_SCAN.match(detail)]
+    if expected and not any(expected in detail for detail in details):
+        problems.append(f'plan does not use {expected}')
+
+    return {
+        'case': name,
+        'p50_ms': statistics.median(timings),
+        'max_ms': max(timings),
+        'budget_ms': budget,
+        'queries': len(statements),
+        'plans': plans,
+        'problems': problems,
+    }
+
+
+def run_size(rows, users, repeat, budget_scale):
+    """Seed ``rows`` expenses and run every case against them"""
+    directory = tempfile.mkdtemp(prefix=f'bench-queries-{rows}-')
+    os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+    app = seed(f'sqlite:///{os.path.join(directory, "bench.db")}', users, rows, quiet=True)
+
+    client = app.test_client()
+    response = client.post('/auth/login', json={'username': 'user1', 'password': BENCH_PASSWORD})
+    assert response.status_code == 200, 'benchmark login failed'
+    user_id = response.get_json()['user']['id']
+
+    results = []
+    for case in CASES:
+        result = run_case(app, client, user_id, case, repeat)
+        if result['p50_ms'] > result['budget_ms'] * budget_scale:
+            result['problems'].append(
+                f'p50 {result["p50_ms"]:.1f}ms over budget {result["budget_ms"] * budget_scale:.0f}ms'
+            )
+        result['rows'] = rows
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark query plans and latency at several data sizes')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-scale', type=float, default=1.0)
+    parser.add_argument('--json', help='write every result (including plans) to this file')
+    parser.add_argument('--verbose', action='store_true', help='print the query plans')
+    args = parser.parse_args()
+
+    all_results = []
+    failed = False
+    print(f'{"rows":>8}  {"case":<24}{"queries":>8}{"p50 ms":>9}{"max ms":>9}{"budget":>8}  result')
+    for rows in args.rows:
+        for result in run_size(rows, args.users, args.repeat, args.budget_scale):
+            all_results.append(result)
+            failed = failed or bool(result['problems'])
+            status = 'ok' if not result['problems'] else 'FAIL: ' + '; '.join(result['problems'])
+            print(f'{rows:>8}  {result["case"]:<24}{result["queries"]:>8}{result["p50_ms"]:>9.1f}'
+                  f'{result["max_ms"]:>9.1f}{result["budget_ms"] * args.budget_scale:>8.0f}  {status}')
+            if args.verbose:
+                for statement, plan in result['plans']:
+                    print('            ' + ' '.join(statement.split())[:100])
+                    for detail in plan:
+                        print('              ' + detail)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(all_results, f, indent=2)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Synthetic data generator for benchmarks and load tests
+
+Usage: python benchmarks/seed.py --database sqlite:///bench.db --users 100 --expenses 100000
+
+Creates the schema and default categories with init_db.py, then bulk-inserts
+N users and M expenses spread across them, the categories and the last three
+years. Every user's password is BENCH_PASSWORD and usernames are user1..userN.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_PASSWORD = 'BenchPass123'
+CHUNK_SIZE = 10000
+WORDS = [
+    'coffee', 'lunch', 'groceries', 'taxi', 'train', 'fuel', 'rent', 'internet', 'phone',
+    'movie', 'concert', 'books', 'course', 'pharmacy', 'dentist', 'hotel', 'flight',
+    'garden', 'furniture', 'gift', 'subscription', 'parking', 'insurance', 'repair',
+]
+
+
+def seed(database_url, users, expenses, seed_value=0, quiet=False):
+    """Populate ``database_url`` and return the app bound to it
+
+    Users and expenses are written with Core executemany in chunks, then
+    the rollups are rebuilt in one statement; the full-text index follows
+    the inserts through its triggers.
+    """
+    os.environ['DATABASE_URL'] = database_url
+    from init_db import init_database
+    from app import create_app, db
+    from app.models.expense import Category, Expense, ExpenseRollup
+    from app.models.user import User
+
+    started = time.perf_counter()
+    if quiet:
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                init_database()
+            finally:
+                sys.stdout = stdout
+    else:
+        init_database()
+
+    app = create_app()
+    rng = random.Random(seed_value)
+    # Bulk chunks are slow by design; keep them out of the slow-query log
+    slow_query_ms, app.config['SLOW_QUERY_MS'] = app.config['SLOW_QUERY_MS'], 0
+    with app.app_context():
+        password_hash = User('seed', 'seed@example.com', BENCH_PASSWORD, 'Seed', 'User').password_hash
+        first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+        now = datetime.utcnow()
+        db.session.execute(User.__table__.insert(), [
+            {
+                'username': f'user{first_user + i}', 'email': f'user{first_user + i}@example.com',
+                'password_hash': password_hash, 'first_name': 'Bench', 'last_name': f'User{i}',
+                'created_at': now, 'is_active': True
+            }
+            for i in range(users)
+        ])
+        user_ids = list(range(first_user, first_user + users))
+        category_ids = [category_id for category_id, in db.session.query(Category.id)]
+        today = date.today()
+
+        for offset in range(0, expenses, CHUNK_SIZE):
+            rows = []
+            for i in range(offset, min(offset + CHUNK_SIZE, expenses)):
+                words = rng.sample(WORDS, 2)
+                rows.append({
+                    'title': f'{words[0].title()} {i}',
+                    'description': f'{words[0]} and {words[1]}',
+                    'amount': round(rng.uniform(1, 250), 2),
+                    'date': today - timedelta(days=rng.randrange(3 * 365)),
+                    'created_at': now - timedelta(seconds=expenses - i),
+                    'updated_at': now,
+                    'user_id': user_ids[i % users],
+                    'category_id': rng.choice(category_ids),
+                })
+            db.session.execute(Expense.__table__.insert(), rows)
+            db.session.commit()
+
+        ExpenseRollup.rebuild()
+        db.session.commit()
+    app.config['SLOW_QUERY_MS'] = slow_query_ms
+
+    if not quiet:
+        print(f'Seeded {users} users and {expenses} expenses in {time.perf_counter() - started:.1f}s')
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic users and expenses')
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL', 'sqlite:///bench.db'))
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--expenses', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    seed(args.database, args.users, args.expenses, args.seed)
+
+
+if __name__ == '__main__':
+    main()
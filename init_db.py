@@ -2,8 +2,9 @@
 Database initialization with default categories
 """
 from app import create_app, db
-from app.models.expense import Category
+from app.models.expense import Category, Expense, ExpenseRollup
 from app.models.user import User
+from app.models.search import create_search_index
 
 def init_database():
     """Initialize database with default categories"""
@@ -13,6 +14,29 @@ def init_database():
         # Create all tables
         db.create_all()
         
+        # create_all() skips existing tables, so add any indexes defined since
+        for index in Expense.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        # Replaced by idx_user_date_category_amount, which starts with the same columns
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('DROP INDEX IF EXISTS idx_user_date')
+        
+        # Create the full-text search index and backfill it from existing expenses
+        with db.engine.begin() as connection:
+            if create_search_index(connection, rebuild=True):
+                print("✅ Full-text search index is up to date")
+        
+        # Backfill the rollup table when the expenses predate it
+        if db.session.query(ExpenseRollup.user_id).first() is None and \
+                db.session.query(Expense.id).first() is not None:
+            try:
+                ExpenseRollup.rebuild()
+                db.session.commit()
+                print("✅ Expense rollups backfilled from existing expenses")
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error backfilling rollups: {e}")
+        
         # Check if categories already exist
         if Category.query.count() == 0:
             # Create default categories
@@ -0,0 +1,44 @@
+"""
+Backfill or verify the monthly expense rollup table
+"""
+import argparse
+from app import create_app, db
+from app.models.expense import ExpenseRollup
+
+
+def rebuild_rollups(user_id=None, verify_only=False):
+    """Rebuild rollups from the expenses table, or only report mismatches"""
+    app = create_app()
+    
+    with app.app_context():
+        db.create_all()
+        
+        if verify_only:
+            mismatches = ExpenseRollup.verify(user_id)
+            for key, expected, actual in mismatches:
+                print(f"❌ {key}: expected (count, total) {expected}, found {actual}")
+            if mismatches:
+                print(f"❌ {len(mismatches)} rollup rows are out of date")
+                return False
+            print("✅ Rollups match the expenses table")
+            return True
+        
+        try:
+            ExpenseRollup.rebuild(user_id)
+            db.session.commit()
+            print("✅ Rollups rebuilt from the expenses table")
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error rebuilding rollups: {e}")
+            return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--user-id', type=int, help='only rebuild/verify this user')
+    parser.add_argument('--verify', action='store_true',
+                        help='report mismatches without changing anything')
+    args = parser.parse_args()
+    
+    raise SystemExit(0 if rebuild_rollups(args.user_id, args.verify) else 1)
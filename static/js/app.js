@@ -131,10 +131,12 @@ const expenseManager = {
     /**
      * Load expenses with optional filters
      * @param {object} filters - Filter parameters
+     * @param {string[]|null} fields - Only return these expense fields (e.g. ['id', 'title'])
      * @returns {Promise} - Promise resolving to expenses data
      */
-    async loadExpenses(filters = {}) {
-        const queryParams = new URLSearchParams(filters).toString();
+    async loadExpenses(filters = {}, fields = null) {
+        const params = fields ? { ...filters, fields: fields.join(',') } : filters;
+        const queryParams = new URLSearchParams(params).toString();
         const url = `/api/expenses${queryParams ? '?' + queryParams : ''}`;
         
         try {
@@ -145,6 +147,23 @@ const expenseManager = {
         }
     },
 
+    /**
+     * Load one page of expenses using cursor (keyset) pagination.
+     * Pass the previous page's next_cursor to continue, e.g. for infinite scroll.
+     * @param {object} filters - Filter parameters
+     * @param {string|null} cursor - The next_cursor of the previous page
+     * @param {string[]|null} fields - Only return these expense fields
+     * @returns {Promise} - Promise resolving to expenses data
+     */
+    async loadExpensesPage(filters = {}, cursor = null, fields = null) {
+        const params = { ...filters, pagination: 'cursor' };
+        delete params.page;
+        if (cursor) {
+            params.cursor = cursor;
+        }
+        return this.loadExpenses(params, fields);
+    },
+
     /**
      * Create new expense
      * @param {object} expenseData - The expense data
@@ -203,6 +222,30 @@ const expenseManager = {
             utils.showToast(error.message || 'Failed to delete expense', 'error');
             throw error;
         }
+    },
+
+    /**
+     * Apply many create/update/delete operations in one request
+     * @param {Array} operations - e.g. [{op: 'delete', id: 1}, {op: 'update', id: 2, data: {...}}]
+     * @returns {Promise} - Promise resolving to per-operation results
+     */
+    async batch(operations) {
+        try {
+            const response = await utils.apiRequest('/api/expenses/batch', {
+                method: 'POST',
+                body: JSON.stringify({ operations })
+            });
+            
+            if (response.failed) {
+                utils.showToast(`${response.applied} applied, ${response.failed} failed`, 'error');
+            } else {
+                utils.showToast(`${response.applied} expenses updated successfully!`, 'success');
+            }
+            return response;
+        } catch (error) {
+            utils.showToast(error.message || 'Failed to apply changes', 'error');
+            throw error;
+        }
     }
 };
 
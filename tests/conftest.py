@@ -0,0 +1,154 @@
+"""
+Shared fixtures for the Expense Tracker test suite
+"""
+import os
+from contextlib import contextmanager
+
+# The engine is built when the app is created, so the test database has to be
+# selected before create_app() runs rather than patched into app.config after.
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+# The minimum bcrypt cost keeps the many test logins fast
+os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+
+import pytest
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import User
+from app.models.expense import Category, Expense
+from app.models.catalog import category_catalog
+from app.utils.cache import VersionedCache
+
+
+def add_expense(user, category, title, amount, expense_date, description=''):
+    """Insert an expense directly through the ORM"""
+    expense = Expense(
+        title=title,
+        description=description,
+        amount=amount,
+        date=expense_date,
+        user_id=user.id,
+        category_id=category.id
+    )
+    db.session.add(expense)
+    db.session.commit()
+    return expense
+
+
+@pytest.fixture
+def app():
+    """Create and configure a test app"""
+    app = create_app()
+    app.config['TESTING'] = True
+    
+    # Every test gets a fresh database, so cached results must not carry over
+    VersionedCache.clear_all()
+    category_catalog.invalidate()
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Test client"""
+    return app.test_client()
+
+
+@pytest.fixture
+def test_user(app):
+    """Create a test user"""
+    user = User(
+        username='testuser',
+        email='test@example.com',
+        password='TestPass123',
+        first_name='Test',
+        last_name='User'
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def test_category(app):
+    """Create a test category"""
+    category = Category(
+        name='Test Category',
+        description='Test description',
+        color='#007bff'
+    )
+    db.session.add(category)
+    db.session.commit()
+    return category
+
+
+@pytest.fixture
+def auth_client(client, test_user):
+    """Test client logged in as the test user"""
+    response = client.post('/auth/login', json={
+        'username': 'testuser',
+        'password': 'TestPass123'
+    })
+    assert response.status_code == 200
+    return client
+
+
+@contextmanager
+def capture_statements():
+    """Collect (statement, parameters) for everything sent to the engine"""
+    captured = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+    
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield captured
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager collecting every SQL statement sent to the engine
+
+    Usage::
+
+        with count_queries() as statements:
+            client.get('/api/expenses')
+        assert len(statements) == 2
+    """
+    @contextmanager
+    def counter():
+        statements = []
+        with capture_statements() as captured:
+            yield statements
+        statements.extend(statement for statement, parameters in captured)
+    
+    return counter
+
+
+@pytest.fixture
+def explain_queries(app):
+    """Run a callable and return the SQLite query plan of each SELECT it issued
+
+    Returns a list of (statement, [plan detail, ...]) pairs.
+    """
+    def explain(func):
+        with capture_statements() as captured:
+            func()
+        
+        connection = db.session.connection()
+        plans = []
+        for statement, parameters in captured:
+            if statement.lstrip().upper().startswith('SELECT'):
+                rows = connection.exec_driver_sql(
+                    'EXPLAIN QUERY PLAN ' + statement, parameters
+                ).all()
+                plans.append((statement, [row[-1] for row in rows]))
+        return plans
+    
+    return explain
@@ -0,0 +1,727 @@
+"""
+Tests for the JSON API endpoints
+"""
+import csv
+import io
+import pstats
+import shutil
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app import create_app, db
+from app.models.catalog import category_catalog
+from app.models.expense import Expense, Category, ExpenseRollup
+from app.models.search import create_search_index, drop_search_index, search_index_available
+from app.models.user import User
+from app.models.version import DataVersion
+from app.routes import api
+from app.utils import group_commit, pdf_export
+from app.utils.cache import VersionedCache
+from tests.conftest import add_expense
+
+
+def test_export_csv_json(auth_client, test_user, test_category):
+    """Test the default export still returns the file wrapped in JSON"""
+    add_expense(test_user, test_category, 'Lunch', 12.5, date(2024, 3, 1))
+    
+    response = auth_client.get('/api/export/csv')
+    assert response.status_code == 200
+    
+    rows = list(csv.reader(io.StringIO(response.get_json()['csv_data'])))
+    assert rows[0] == ['Date', 'Title', 'Description', 'Amount', 'Category']
+    assert rows[1] == ['2024-03-01', 'Lunch', '', '12.5', 'Test Category']
+
+
+def test_export_csv_stream(auth_client, test_user, test_category):
+    """Test the streaming export sends a chunked text/csv download"""
+    for day in range(1, 29):
+        add_expense(test_user, test_category, f'Item {day}', day, date(2024, 2, day))
+    
+    response = auth_client.get('/api/export/csv?stream=1')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+    
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 29
+    assert rows[1][1] == 'Item 28'
+
+
+def test_export_csv_stream_filters(auth_client, test_user, test_category):
+    """Test the streaming export honours the listing filters"""
+    add_expense(test_user, test_category, 'January', 10, date(2024, 1, 15))
+    add_expense(test_user, test_category, 'February', 20, date(2024, 2, 15))
+    
+    response = auth_client.get(
+        '/api/export/csv?stream=1&start_date=2024-02-01&end_date=2024-02-29'
+    )
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert [row[1] for row in rows[1:]] == ['February']
+    
+    response = auth_client.get('/api/export/csv?stream=1&start_date=bad')
+    assert response.status_code == 400
+
+
+def test_get_expenses_cursor_pagination(auth_client, test_user, test_category):
+    """Test cursor pagination walks every row exactly once, newest first"""
+    for i in range(7):
+        # Several rows share a date so the created_at/id tie-breakers matter
+        add_expense(test_user, test_category, f'Item {i}', 1 + i, date(2024, 1, 1 + i // 3))
+    
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/expenses?pagination=cursor&per_page=3'
+        if cursor:
+            url += f'&cursor={cursor}'
+        data = auth_client.get(url).get_json()
+        assert 'total' not in data['pagination']
+        seen.extend(expense['title'] for expense in data['expenses'])
+        cursor = data['pagination']['next_cursor']
+        if not data['pagination']['has_next']:
+            assert cursor is None
+            break
+    
+    assert seen == [f'Item {i}' for i in reversed(range(7))]
+
+
+def test_get_expenses_cursor_total_and_errors(auth_client, test_user, test_category):
+    """Test the optional total count and rejection of malformed cursors"""
+    add_expense(test_user, test_category, 'Only', 5, date(2024, 1, 1))
+    
+    data = auth_client.get('/api/expenses?pagination=cursor&include_total=1').get_json()
+    assert data['pagination']['total'] == 1
+    
+    response = auth_client.get('/api/expenses?pagination=cursor&cursor=not-a-cursor')
+    assert response.status_code == 400
+
+
+def test_get_expenses_sparse_fields(app, auth_client, test_user, test_category):
+    """Test listings match to_dict() and ``fields`` trims them to the requested keys"""
+    expense = add_expense(test_user, test_category, 'Lunch', 12.5, date(2024, 1, 1), 'Team')
+    older = add_expense(test_user, test_category, 'Bus', 3, date(2023, 1, 1))
+    
+    listed = auth_client.get('/api/expenses').get_json()['expenses']
+    assert listed[0] == app.json.loads(app.json.dumps(expense.to_dict()))
+    
+    sparse = auth_client.get('/api/expenses?fields=amount,title,category&pagination=cursor').get_json()
+    assert [list(item) for item in sparse['expenses']] == [['title', 'amount', 'category']] * 2
+    assert sparse['expenses'][0]['category']['name'] == 'Test Category'
+    
+    narrow = auth_client.get('/api/expenses?fields=id&per_page=1&pagination=cursor').get_json()
+    assert narrow['expenses'] == [{'id': expense.id}]
+    cursor = narrow['pagination']['next_cursor']
+    assert auth_client.get(f'/api/expenses?fields=id&pagination=cursor&cursor={cursor}')\
+        .get_json()['expenses'] == [{'id': older.id}]
+    
+    response = auth_client.get('/api/expenses?fields=id,password_hash')
+    assert response.status_code == 400
+    assert 'password_hash' in response.get_json()['error']
+
+
+def add_categories(count):
+    """Insert ``count`` distinct categories"""
+    categories = [Category(name=f'Category {i}') for i in range(count)]
+    db.session.add_all(categories)
+    db.session.commit()
+    return categories
+
+
+def test_get_expenses_query_count_is_constant(auth_client, test_user, count_queries):
+    """Test listing cost does not grow with the page size (no N+1 category loads)"""
+    # One category per row, so lazy loads could not be served from the identity map
+    for i, category in enumerate(add_categories(20)):
+        add_expense(test_user, category, f'Item {i}', 1 + i, date(2024, 1, 1))
+    
+    db.session.expire_all()
+    with count_queries() as small_page:
+        auth_client.get('/api/expenses?per_page=2')
+    db.session.expire_all()
+    with count_queries() as large_page:
+        data = auth_client.get('/api/expenses?per_page=20').get_json()
+    
+    assert len(data['expenses']) == 20
+    assert all(expense['category'] for expense in data['expenses'])
+    assert len(large_page) == len(small_page)
+
+
+def test_dashboard_query_count_is_constant(auth_client, test_user, count_queries):
+    """Test the dashboard and its fragments render without per-row queries"""
+    def measure():
+        auth_client.get('/dashboard')  # warm the catalog and stats caches
+        db.session.expire_all()
+        with count_queries() as statements:
+            for url in ('/dashboard', '/dashboard/recent', '/dashboard/summary'):
+                assert auth_client.get(url).status_code == 200
+        return statements
+    
+    categories = add_categories(10)
+    add_expense(test_user, categories[0], 'First', 1, date.today())
+    one_row = measure()
+    
+    for i, category in enumerate(categories[1:]):
+        add_expense(test_user, category, f'Item {i}', 1 + i, date.today())
+    ten_rows = measure()
+    
+    assert len(ten_rows) == len(one_row)
+
+
+def test_search_full_text_index(auth_client, test_category):
+    """Test search matches word prefixes and follows create/update/delete"""
+    def create(title, description=''):
+        response = auth_client.post('/api/expenses', json={
+            'title': title,
+            'description': description,
+            'amount': 10,
+            'category_id': test_category.id,
+            'date': '2024-01-01'
+        })
+        return response.get_json()['expense']['id']
+    
+    def search(term):
+        data = auth_client.get(f'/api/expenses?search={term}').get_json()
+        return [expense['title'] for expense in data['expenses']]
+    
+    assert search_index_available()
+    coffee_id = create('Coffee beans', 'Ethiopian roast')
+    create('Groceries', 'milk and coffee filters')
+    create('Train ticket')
+    
+    assert search('coff') == ['Coffee beans', 'Groceries']
+    assert search('coffee roast') == ['Coffee beans']
+    assert search('ethiop') == ['Coffee beans']
+    
+    auth_client.put(f'/api/expenses/{coffee_id}', json={
+        'title': 'Tea leaves',
+        'amount': 10,
+        'category_id': test_category.id
+    })
+    assert search('coffee') == ['Groceries']
+    assert search('tea') == ['Tea leaves']
+    
+    auth_client.delete(f'/api/expenses/{coffee_id}')
+    assert search('tea') == []
+
+
+def test_search_is_per_user(auth_client, test_user, test_category):
+    """Test search only matches the current user's expenses, also after upgrading an old index"""
+    other = User(username='other', email='other@example.com', password='OtherPass123',
+                 first_name='Other', last_name='User')
+    db.session.add(other)
+    db.session.commit()
+    add_expense(test_user, test_category, 'Coffee beans', 5, date(2024, 1, 1))
+    add_expense(other, test_category, 'Coffee filters', 6, date(2024, 1, 2))
+    
+    def search(term):
+        data = auth_client.get(f'/api/expenses?search={term}').get_json()
+        return [expense['title'] for expense in data['expenses']]
+    
+    assert search('coffee') == ['Coffee beans']
+    # The indexed user id is not searchable as text
+    assert search(str(test_user.id)) == []
+    
+    # An index from before user_id was indexed is recreated by init_db's rebuild
+    with db.engine.begin() as connection:
+        drop_search_index(connection)
+        connection.exec_driver_sql(
+            "CREATE VIRTUAL TABLE expenses_fts USING fts5(title, description, "
+            "content='expenses', content_rowid='id')"
+        )
+        create_search_index(connection, rebuild=True)
+    assert search('coffee') == ['Coffee beans']
+
+
+def test_conditional_get_expenses(auth_client, test_user, test_category, count_queries):
+    """Test repeat listing requests are answered with 304 from the version lookup"""
+    add_expense(test_user, test_category, 'Lunch', 12, date(2024, 1, 1))
+    
+    response = auth_client.get('/api/expenses')
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    assert response.last_modified is not None
+    
+    with count_queries() as statements:
+        response = auth_client.get('/api/expenses', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert len(statements) == 1
+    
+    # Different filters are a different representation
+    response = auth_client.get('/api/expenses?per_page=5', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    
+    auth_client.post('/api/expenses', json={
+        'title': 'Dinner',
+        'amount': 20,
+        'category_id': test_category.id,
+        'date': '2024-01-02'
+    })
+    response = auth_client.get('/api/expenses', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_conditional_get_categories(auth_client, test_category):
+    """Test the category list validator changes when a category is created"""
+    response = auth_client.get('/api/categories')
+    etag = response.headers['ETag']
+    
+    assert auth_client.get('/api/categories', headers={'If-None-Match': etag}).status_code == 304
+    
+    auth_client.post('/api/categories', json={'name': 'Travel'})
+    response = auth_client.get('/api/categories', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(response.get_json()['categories']) == 2
+    
+    # Last-Modified is only to the second, so it is not used to answer 304
+    modified = auth_client.get('/api/stats/summary')
+    response = auth_client.get('/api/stats/summary', headers={
+        'If-Modified-Since': modified.headers['Last-Modified']
+    })
+    assert response.status_code == 200
+    assert response.get_json() == modified.get_json()
+
+
+def test_category_catalog_cache(auth_client, test_category, count_queries, app):
+    """Test categories are served from the catalog and refreshed on writes"""
+    auth_client.get('/api/categories')
+    with count_queries() as statements:
+        auth_client.get('/expenses')
+    assert not any('FROM categories' in statement for statement in statements)
+    
+    # Writes in this process invalidate the catalog on commit
+    auth_client.post('/api/categories', json={'name': 'Travel'})
+    names = [c['name'] for c in auth_client.get('/api/categories').get_json()['categories']]
+    assert names == ['Test Category', 'Travel']
+    assert auth_client.post('/api/categories', json={'name': 'Travel'}).status_code == 400
+    
+    # Writes from another process are seen once the version row is re-checked
+    app.config['CATEGORY_CATALOG_CHECK_INTERVAL'] = 0
+    with db.engine.begin() as connection:
+        connection.execute(Category.__table__.insert().values(
+            name='Other process', color='#000000', created_at=datetime.utcnow()
+        ))
+        DataVersion.bump(connection, DataVersion.CATEGORIES)
+    names = [c['name'] for c in auth_client.get('/api/categories').get_json()['categories']]
+    assert names[-1] == 'Other process'
+
+
+def test_import_csv_round_trip(auth_client, test_user, test_category, count_queries,
+                               monkeypatch):
+    """Test an exported CSV imports back in batched inserts with exact rollups"""
+    for day in range(1, 8):
+        add_expense(test_user, test_category, f'Item {day}', day, date(2024, 5, day),
+                    description='with, comma')
+    exported = auth_client.get('/api/export/csv?stream=1').get_data()
+    
+    monkeypatch.setattr('app.routes.api.IMPORT_CHUNK_SIZE', 3)
+    with count_queries() as statements:
+        response = auth_client.post('/api/expenses/import', data=exported,
+                                    content_type='text/csv')
+    
+    assert response.get_json() == {'imported': 7, 'failed': 0, 'errors': []}
+    assert sum(s.startswith('INSERT INTO expenses ') for s in statements) == 3
+    assert Expense.query.filter_by(description='with, comma').count() == 14
+    assert ExpenseRollup.verify() == []
+
+
+def test_import_jsonl_reports_row_errors(auth_client, test_category):
+    """Test invalid JSON lines are reported per row while valid ones import"""
+    lines = [
+        '{"title": "Coffee", "amount": 3.5, "category": "Test Category", "date": "2024-01-02"}',
+        '{"title": "", "amount": 3.5, "category_id": %d}' % test_category.id,
+        'not json',
+        '',
+        '{"title": "Taxi", "amount": 12, "category": "Nope"}',
+        '{"title": "Book", "amount": "9.99", "category_id": %d}' % test_category.id,
+    ]
+    response = auth_client.post('/api/expenses/import?format=jsonl',
+                                data='\n'.join(lines))
+    
+    report = response.get_json()
+    assert report['imported'] == 2
+    assert [error['row'] for error in report['errors']] == [2, 3, 5]
+    assert report['errors'][2]['errors'] == ["Unknown category 'Nope'"]
+    
+    titles = [e['title'] for e in auth_client.get('/api/expenses').get_json()['expenses']]
+    assert sorted(titles) == ['Book', 'Coffee']
+    assert auth_client.get('/api/stats/summary').get_json()['total_expenses'] == 2
+
+
+def test_import_isolates_bad_rows(auth_client, test_category, monkeypatch):
+    """Test malformed values are reported per row and a failing chunk only fails its bad rows"""
+    lines = [
+        '{"title": "Coffee", "amount": 3.5, "category_id": %d, "date": "2024-01-02"}' % test_category.id,
+        '{"title": "Odd date", "amount": 3.5, "category_id": %d, "date": 20240101}' % test_category.id,
+        '{"title": "Not a number", "amount": "nan", "category_id": %d}' % test_category.id,
+        '{"title": "Boom", "amount": 1, "category_id": %d}' % test_category.id,
+        '{"title": "Tea", "amount": 2, "category_id": %d}' % test_category.id,
+    ]
+    insert_chunk = api._insert_import_chunk
+    
+    def failing_insert(rows):
+        if any(row['title'] == 'Boom' for row in rows):
+            raise IntegrityError('INSERT', {}, Exception('rejected'))
+        insert_chunk(rows)
+    
+    monkeypatch.setattr(api, '_insert_import_chunk', failing_insert)
+    report = auth_client.post('/api/expenses/import?format=jsonl', data='\n'.join(lines)).get_json()
+    
+    assert report['imported'] == 2
+    assert [error['row'] for error in report['errors']] == [2, 3, 4]
+    assert report['errors'][0]['errors'] == ['Invalid date format']
+    assert report['errors'][2]['errors'] == ['Failed to import row']
+    assert sorted(e.title for e in Expense.query.all()) == ['Coffee', 'Tea']
+    assert ExpenseRollup.verify() == []
+
+
+def test_batch_expenses(auth_client, test_user, test_category, count_queries):
+    """Test mixed batch operations apply together with per-item results"""
+    keep = add_expense(test_user, test_category, 'Keep', 5, date(2024, 1, 1)).id
+    drop = add_expense(test_user, test_category, 'Drop', 6, date(2024, 1, 2)).id
+    
+    other = User(username='other', email='other@example.com', password='OtherPass123',
+                 first_name='Other', last_name='User')
+    db.session.add(other)
+    db.session.commit()
+    foreign = add_expense(other, test_category, 'Not mine', 7, date(2024, 1, 3)).id
+    
+    operations = [
+        {'op': 'create', 'data': {'title': 'New', 'amount': 8,
+                                  'category_id': test_category.id, 'date': '2024-02-01'}},
+        {'op': 'update', 'id': keep, 'data': {'title': 'Kept', 'amount': 9,
+                                              'category_id': test_category.id}},
+        {'op': 'delete', 'id': drop},
+        {'op': 'delete', 'id': foreign},
+        {'op': 'create', 'data': {'title': '', 'amount': 1, 'category_id': test_category.id}},
+        {'op': 'rename'},
+    ]
+    with count_queries() as statements:
+        response = auth_client.post('/api/expenses/batch', json={'operations': operations})
+    
+    data = response.get_json()
+    assert [result['status'] for result in data['results']] == \
+        ['created', 'updated', 'deleted', 'error', 'error', 'error']
+    assert data['results'][0]['expense']['title'] == 'New'
+    assert data['results'][1]['expense']['amount'] == 9
+    assert data['results'][3]['errors'] == ['Expense not found']
+    assert (data['applied'], data['failed']) == (3, 3)
+    
+    # One ownership-checked fetch for all targets
+    assert sum(s.startswith('SELECT expenses.') and 'IN (' in s for s in statements) == 2
+    
+    titles = sorted(e.title for e in Expense.query.filter_by(user_id=test_user.id))
+    assert titles == ['Kept', 'New']
+    assert db.session.get(Expense, foreign) is not None
+    assert ExpenseRollup.verify() == []
+    
+    response = auth_client.post('/api/expenses/batch', json={'operations': []})
+    assert response.status_code == 400
+    
+    # Malformed bodies and payloads are reported, not crashed on
+    assert auth_client.post('/api/expenses/batch', json=[{'op': 'create'}]).status_code == 400
+    response = auth_client.post('/api/expenses/batch', json={'operations': [
+        {'op': 'create', 'data': [1]},
+        {'op': 'create', 'data': {'title': 'Ghost', 'amount': 1, 'category_id': 9999}},
+    ]})
+    assert [result['errors'] for result in response.get_json()['results']] == \
+        [['Expense data must be an object'], ['Invalid category selected']]
+
+
+def test_export_pdf_job(app, auth_client, test_user, test_category, tmp_path, monkeypatch):
+    """Test a PDF export job reports progress and serves the finished file"""
+    app.config.update(PDF_EXPORT_WORKERS=0, PDF_EXPORT_DIR=str(tmp_path))
+    monkeypatch.setattr('app.utils.pdf_export.ROWS_PER_PAGE', 4)
+    for day in range(1, 11):
+        add_expense(test_user, test_category, f'Expense {day}', day, date(2024, 1, day))
+    
+    response = auth_client.post('/api/export/pdf', json={'start_date': '2024-01-03'})
+    assert response.status_code == 202
+    job = response.get_json()
+    
+    assert auth_client.post('/api/export/pdf', json={'start_date': 5}).status_code == 400
+    assert auth_client.post('/api/export/pdf', json=['2024-01-03']).status_code == 400
+    
+    status = auth_client.get(job['status_url']).get_json()
+    assert (status['state'], status['rows_done'], status['rows_total']) == ('done', 8, 8)
+    
+    response = auth_client.get(job['download_url'])
+    assert response.mimetype == 'application/pdf'
+    assert response.data.startswith(b'%PDF')
+    assert response.data.count(b'/Type /Page\n') == 2
+    
+    # Jobs are private to the user who started them
+    assert auth_client.get('/api/export/pdf/not-a-job').status_code == 404
+    auth_client.get('/auth/logout')
+    other = User(username='other', email='other@example.com', password='OtherPass123',
+                 first_name='Other', last_name='User')
+    db.session.add(other)
+    db.session.commit()
+    auth_client.post('/auth/login', json={'username': 'other', 'password': 'OtherPass123'})
+    assert auth_client.get(job['status_url']).status_code == 404
+    
+    assert auth_client.post('/api/export/pdf', json={'end_date': 'soon'}).status_code == 400
+
+
+def test_export_pdf_broken_workers(app, auth_client, tmp_path, monkeypatch):
+    """Test a dead worker pool fails the job, answers 503 and is replaced"""
+    app.config.update(PDF_EXPORT_WORKERS=1, PDF_EXPORT_DIR=str(tmp_path))
+    
+    class DeadPool:
+        def __init__(self, broken):
+            self.broken = broken
+            self.futures = []
+        
+        def submit(self, *args):
+            if self.broken:
+                raise BrokenProcessPool('worker died')
+            self.futures.append(Future())
+            return self.futures[-1]
+        
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+    
+    # A worker that dies mid-job leaves a failed status instead of "running"
+    pool = DeadPool(broken=False)
+    monkeypatch.setattr(pdf_export, '_executor', pool)
+    job = auth_client.post('/api/export/pdf', json={}).get_json()
+    pool.futures[0].set_exception(BrokenProcessPool('worker died'))
+    assert auth_client.get(job['status_url']).get_json()['state'] == 'failed'
+    assert pdf_export._executor is None
+    
+    # A pool that is already broken is dropped and the request answered with 503
+    pool = DeadPool(broken=True)
+    monkeypatch.setattr(pdf_export, '_executor', pool)
+    response = auth_client.post('/api/export/pdf', json={})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert pdf_export._executor is None
+    statuses = [pdf_export.read_status(str(tmp_path), path.stem) for path in tmp_path.glob('*.json')]
+    assert sorted(status['state'] for status in statuses) == ['failed', 'failed']
+
+
+def test_bulk_expense_operations(auth_client, test_user, test_category):
+    """Test recategorize/delete by filter and account deletion over the API"""
+    other = Category(name='Other', color='#28a745')
+    db.session.add(other)
+    db.session.commit()
+    for day in range(1, 6):
+        add_expense(test_user, test_category, f'Expense {day}', day, date(2024, 1, day))
+    
+    response = auth_client.post('/api/expenses/recategorize', json={
+        'category_id': test_category.id, 'start_date': '2024-01-03', 'to_category_id': other.id
+    })
+    assert response.get_json()['updated'] == 3
+    assert auth_client.post('/api/expenses/recategorize', json={'to_category_id': 999}).status_code == 404
+    
+    assert auth_client.post('/api/expenses/bulk-delete', json={}).status_code == 400
+    assert auth_client.post('/api/expenses/bulk-delete', json=[1]).status_code == 400
+    assert auth_client.post('/api/expenses/bulk-delete', json={'start_date': 20240101}).status_code == 400
+    response = auth_client.post('/api/expenses/bulk-delete', json={'search': 7})
+    assert response.get_json()['deleted'] == 0
+    response = auth_client.post('/api/expenses/bulk-delete', json={'category_id': other.id})
+    assert response.get_json()['deleted'] == 3
+    assert ExpenseRollup.verify() == []
+    
+    user_id = test_user.id
+    response = auth_client.delete('/auth/account', json={'password': 'wrong'})
+    assert response.status_code == 403
+    response = auth_client.delete('/auth/account', json={'password': 'TestPass123'})
+    assert response.get_json()['deleted_expenses'] == 2
+    assert db.session.get(User, user_id) is None
+    assert auth_client.get('/api/expenses').status_code in (302, 401)
+
+
+def test_dashboard_renders_from_aggregates(auth_client, test_user, test_category, count_queries):
+    """Test /dashboard reads no expense rows and its widgets load as fragments"""
+    for day in range(1, 4):
+        add_expense(test_user, test_category, f'Item {day}', day, date.today().replace(day=day))
+    
+    with count_queries() as statements:
+        response = auth_client.get('/dashboard')
+    assert b'$6.00' in response.data
+    assert not any('FROM expenses' in statement for statement in statements)
+    
+    recent = auth_client.get('/dashboard/recent')
+    assert b'Item 3' in recent.data and b'<html' not in recent.data
+    
+    summary = auth_client.get('/dashboard/summary')
+    assert b'Test Category' in summary.data
+    assert auth_client.get('/dashboard/summary', headers={
+        'If-None-Match': summary.headers['ETag']
+    }).status_code == 304
+
+
+def test_user_loader_uses_cache(auth_client, test_user, count_queries):
+    """Test authenticated requests skip the user lookup until the user changes"""
+    auth_client.get('/api/categories')
+    with count_queries() as statements:
+        assert auth_client.get('/api/categories').status_code == 200
+    assert not any('FROM users' in statement for statement in statements)
+    
+    test_user.first_name = 'Renamed'
+    db.session.commit()
+    assert b'Renamed' in auth_client.get('/dashboard').data
+    
+    test_user.is_active = False
+    db.session.commit()
+    assert auth_client.get('/api/categories').status_code in (302, 401)
+
+
+def test_create_expense_with_group_commit(app, auth_client, test_category):
+    """Test expense creation answers the same through the group-commit writer"""
+    app.config['GROUP_COMMIT'] = True
+    group_commit.init_app(app)
+    
+    response = auth_client.post('/api/expenses', json={
+        'title': 'Grouped', 'amount': 12.5, 'category_id': test_category.id, 'date': '2024-03-01'
+    })
+    assert response.status_code == 201
+    expense = response.get_json()['expense']
+    assert (expense['title'], expense['category']['name']) == ('Grouped', 'Test Category')
+    
+    db.session.expire_all()
+    assert db.session.get(Expense, expense['id']).amount == 12.5
+    assert ExpenseRollup.verify() == []
+
+
+def test_group_commit_timeout_withdraws_the_expense(app, auth_client, test_category):
+    """Test a create that times out while queued is cancelled rather than committed later"""
+    app.config.update(GROUP_COMMIT=True, GROUP_COMMIT_WINDOW_MS=300, GROUP_COMMIT_TIMEOUT=0.05)
+    group_commit.init_app(app)
+    
+    response = auth_client.post('/api/expenses', json={
+        'title': 'Late', 'amount': 1, 'category_id': test_category.id, 'date': '2024-03-01'
+    })
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    
+    time.sleep(0.5)  # past the writer's window
+    db.session.expire_all()
+    assert Expense.query.count() == 0
+
+
+def test_read_replica_routing(tmp_path, monkeypatch):
+    """Test read-only endpoints read the replica while writes stay on the primary"""
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{primary}')
+    monkeypatch.setenv('DATABASE_REPLICA_URL', f'sqlite:///{replica}')
+    # The replica bind registers its own metadata on db; keep it out of other tests
+    monkeypatch.setattr(db, 'metadatas', dict(db.metadatas))
+    VersionedCache.clear_all()
+    category_catalog.invalidate()
+    app = create_app()
+    
+    with app.app_context():
+        db.create_all()
+        user = User(username='reader', email='reader@example.com', password='ReaderPass1',
+                    first_name='Read', last_name='Er')
+        category = Category(name='Replicated', color='#000000')
+        db.session.add_all([user, category])
+        db.session.commit()
+        add_expense(user, category, 'Replicated', 1, date(2024, 1, 1))
+        category_id = category.id
+        db.engines[None].dispose()
+    shutil.copy(primary, replica)  # "replicate" the primary as it is now
+    
+    client = app.test_client()
+    client.post('/auth/login', json={'username': 'reader', 'password': 'ReaderPass1'})
+    response = client.post('/api/expenses', json={
+        'title': 'Not replicated yet', 'amount': 2, 'category_id': category_id, 'date': '2024-01-02'
+    })
+    assert response.status_code == 201
+    
+    titles = [e['title'] for e in client.get('/api/expenses').get_json()['expenses']]
+    assert titles == ['Replicated']
+    assert client.get('/api/stats/summary').get_json()['total_expenses'] == 1
+    
+    with app.test_request_context():
+        db.session.info['prefer_replica'] = True
+        assert Expense.query.count() == 1
+        db.session.add(Expense(title='Own write', amount=3, date=date(2024, 1, 3),
+                               user_id=1, category_id=category_id))
+        db.session.flush()
+        # Once the request has written, it reads its own writes from the primary
+        assert Expense.query.count() == 3
+        db.session.rollback()
+
+
+def test_sql_instrumentation_headers_log_and_metrics(app, auth_client, test_user, test_category, caplog):
+    """Test requests report their SQL time and /metrics aggregates it per endpoint"""
+    add_expense(test_user, test_category, 'Lunch', 12, date(2024, 3, 1))
+    
+    response = auth_client.get('/api/expenses')
+    timings = response.headers.getlist('Server-Timing')
+    assert timings[0].startswith('db;dur=') and timings[0].endswith('queries"')
+    assert [timing.split(';')[0] for timing in timings] == ['db', 'db-slowest', 'app']
+    
+    app.config['SLOW_QUERY_MS'] = 0.000001
+    with caplog.at_level('WARNING'):
+        auth_client.get('/api/expenses')
+    assert any('Slow query' in message and 'api.get_expenses' in message for message in caplog.messages)
+    app.config['SLOW_QUERY_MS'] = 0
+    
+    # Metrics stay private until a scrape token is configured
+    assert auth_client.get('/metrics').status_code == 404
+    app.config['METRICS_TOKEN'] = 'scrape-me'
+    assert auth_client.get('/metrics').status_code == 401
+    
+    metrics = auth_client.get('/metrics', headers={'Authorization': 'Bearer scrape-me'}).get_data(as_text=True)
+    assert 'http_requests_total{endpoint="api.get_expenses",method="GET",status="200"} 2' in metrics
+    assert 'http_request_duration_seconds_count{endpoint="api.get_expenses"} 2' in metrics
+    assert 'db_request_duration_seconds_bucket{endpoint="api.get_expenses",le="+Inf"} 2' in metrics
+    assert 'db_slow_statements_total{endpoint="api.get_expenses"}' in metrics
+
+
+def test_profile_request_for_admins(tmp_path, monkeypatch):
+    """Test admins can profile single requests and old profiles are pruned"""
+    monkeypatch.setenv('PROFILING', '1')
+    monkeypatch.setenv('PROFILING_ADMINS', 'admin')
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path))
+    monkeypatch.setenv('PROFILE_MAX_FILES', '2')
+    app = create_app()
+    
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='admin', email='admin@example.com', password='AdminPass1',
+                 first_name='Ad', last_name='Min'),
+            User(username='member', email='member@example.com', password='MemberPass1',
+                 first_name='Mem', last_name='Ber'),
+        ])
+        db.session.commit()
+    
+    # Each request gets its own app context (and so its own current_user)
+    member = app.test_client()
+    member.post('/auth/login', json={'username': 'member', 'password': 'MemberPass1'})
+    assert 'X-Profile-Id' not in member.get('/api/expenses', headers={'X-Profile': '1'}).headers
+    
+    admin = app.test_client()
+    admin.post('/auth/login', json={'username': 'admin', 'password': 'AdminPass1'})
+    assert 'X-Profile-Id' not in admin.get('/api/expenses').headers
+    
+    profile_ids = []
+    for url in ('/api/expenses', '/api/export/csv?stream=1&_profile=1', '/analytics'):
+        response = admin.get(url, headers={'X-Profile': '1'})
+        response.get_data()
+        response.close()
+        profile_ids.append(response.headers['X-Profile-Id'])
+    
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        f'{profile_id}{suffix}' for profile_id in profile_ids[1:] for suffix in ('.prof', '.collapsed')
+    )
+    stats = pstats.Stats(str(tmp_path / f'{profile_ids[2]}.prof'))
+    assert any(function == 'analytics' for _, _, function in stats.stats)
+    
+    # A profiled request whose exception propagates still releases the profiler
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+    monkeypatch.setattr(api, '_expense_rows', lambda *args: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        admin.get('/api/expenses', headers={'X-Profile': '1'})
+    assert 'X-Profile-Id' in admin.get('/categories?_profile=1').headers
+    
+    with app.app_context():
+        db.drop_all()
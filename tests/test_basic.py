@@ -2,56 +2,11 @@
 Basic tests for the Expense Tracker application
 """
 import pytest
-from app import create_app, db
+from threading import Event, Thread
+from app import db
 from app.models.user import User
 from app.models.expense import Category, Expense
-
-
-@pytest.fixture
-def app():
-    """Create and configure a test app"""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
-
-
-@pytest.fixture
-def client(app):
-    """Test client"""
-    return app.test_client()
-
-
-@pytest.fixture
-def test_user(app):
-    """Create a test user"""
-    user = User(
-        username='testuser',
-        email='test@example.com',
-        password='TestPass123',
-        first_name='Test',
-        last_name='User'
-    )
-    db.session.add(user)
-    db.session.commit()
-    return user
-
-
-@pytest.fixture
-def test_category(app):
-    """Create a test category"""
-    category = Category(
-        name='Test Category',
-        description='Test description',
-        color='#007bff'
-    )
-    db.session.add(category)
-    db.session.commit()
-    return category
+from app.utils.passwords import HashingPool, hash_cost
 
 
 def test_app_creation(app):
@@ -130,5 +85,42 @@ def test_api_categories_unauthorized(client):
     assert response.status_code == 302  # Redirect to login
 
 
+def test_login_rehashes_when_cost_changes(app, client, test_user):
+    """Test a login upgrades the stored hash to the configured bcrypt cost"""
+    assert hash_cost(test_user.password_hash) == 4
+    
+    app.config['BCRYPT_LOG_ROUNDS'] = 5
+    response = client.post('/auth/login', json={'username': 'testuser', 'password': 'TestPass123'})
+    assert response.status_code == 200
+    
+    db.session.expire_all()
+    assert hash_cost(test_user.password_hash) == 5
+    assert test_user.check_password('TestPass123')
+
+
+def test_login_sheds_load_when_hashing_pool_is_full(app, client, test_user):
+    """Test logins get a 503 instead of queueing when the hashing pool is saturated"""
+    app.extensions['password_hashing'] = HashingPool(workers=1, queue_depth=0)
+    started, release = Event(), Event()
+    
+    def occupy():
+        started.set()
+        release.wait()
+    
+    blocker = Thread(target=app.extensions['password_hashing'].run, args=(occupy,))
+    blocker.start()
+    started.wait()
+    try:
+        response = client.post('/auth/login', json={'username': 'testuser', 'password': 'TestPass123'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        release.set()
+        blocker.join()
+    
+    response = client.post('/auth/login', json={'username': 'testuser', 'password': 'TestPass123'})
+    assert response.status_code == 200
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,220 @@
+"""
+Tests for model-level summaries and the rollup table
+"""
+import re
+from datetime import date
+from app import create_app, db
+from app.models.expense import Expense, ExpenseRollup, Category
+from app.models.user import User
+from app.models.version import DataVersion
+from tests.conftest import add_expense
+
+
+def test_rollup_follows_expense_writes(test_user, test_category):
+    """Test inserts, updates (including moves) and deletes keep rollups exact"""
+    other = Category(name='Other')
+    db.session.add(other)
+    db.session.commit()
+    
+    first = add_expense(test_user, test_category, 'Expense', 10, date(2024, 1, 5))
+    add_expense(test_user, test_category, 'Expense', 15.5, date(2024, 1, 20))
+    add_expense(test_user, other, 'Expense', 7, date(2024, 2, 1))
+    assert ExpenseRollup.verify() == []
+    
+    # Move across month and category, and change the amount
+    first.date = date(2024, 2, 10)
+    first.category_id = other.id
+    first.amount = 12
+    db.session.commit()
+    assert ExpenseRollup.verify() == []
+    
+    january = Expense.get_monthly_summary(test_user.id, 2024, 1)
+    assert [(row.category, float(row.total), row.count) for row in january] == \
+        [('Test Category', 15.5, 1)]
+    
+    db.session.delete(first)
+    db.session.commit()
+    assert ExpenseRollup.verify() == []
+    assert ExpenseRollup.get_totals(test_user.id) == (2, 22.5)
+
+
+def test_rollup_rebuild_and_verify(test_user, test_category):
+    """Test verify reports drift and rebuild repairs it"""
+    add_expense(test_user, test_category, 'Expense', 10, date(2024, 3, 1))
+    add_expense(test_user, test_category, 'Expense', 20, date(2024, 4, 1))
+    
+    ExpenseRollup.query.delete()
+    db.session.commit()
+    assert len(ExpenseRollup.verify()) == 2
+    
+    ExpenseRollup.rebuild(test_user.id)
+    db.session.commit()
+    assert ExpenseRollup.verify() == []
+    
+    yearly = Expense.get_yearly_summary(test_user.id, 2024)
+    assert [(row.month, float(row.total), row.count) for row in yearly] == \
+        [(3, 10, 1), (4, 20, 1)]
+
+
+def test_rollup_adjust_is_a_single_upsert(test_user, test_category, count_queries):
+    """Test a new rollup row is written with one INSERT ... ON CONFLICT, never UPDATE-then-INSERT"""
+    user_id, category_id = test_user.id, test_category.id
+    connection = db.session.connection()
+    with count_queries() as statements:
+        ExpenseRollup.adjust(connection, user_id, date(2024, 5, 1), category_id, 10, 1)
+        ExpenseRollup.adjust(connection, user_id, date(2024, 5, 9), category_id, 5, 1)
+    assert len(statements) == 2
+    assert all(statement.startswith('INSERT') and 'ON CONFLICT' in statement for statement in statements)
+    
+    row = db.session.get(ExpenseRollup, (user_id, 2024, 5, category_id))
+    assert (float(row.total), row.count) == (15, 2)
+
+
+def test_data_version_bump_is_a_single_upsert(app, count_queries):
+    """Test the first bump of a key inserts it in the same statement later bumps use"""
+    connection = db.session.connection()
+    with count_queries() as statements:
+        DataVersion.bump(connection, 'user:new')
+        DataVersion.bump(connection, 'user:new')
+    assert len(statements) == 2
+    assert all(statement.startswith('INSERT') and 'ON CONFLICT' in statement for statement in statements)
+    assert DataVersion.get('user:new') == 2
+
+
+def test_init_db_backfills_empty_rollups(tmp_path, monkeypatch):
+    """Test init_db fills the rollup table of a database whose expenses predate it"""
+    from init_db import init_database
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "existing.db"}')
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(username='saver', email='saver@example.com', password='SaverPass123',
+                    first_name='Saver', last_name='User')
+        category = Category(name='Food')
+        db.session.add_all([user, category])
+        db.session.commit()
+        add_expense(user, category, 'Expense', 10, date(2024, 3, 1))
+        add_expense(user, category, 'Expense', 20, date(2024, 3, 2))
+        ExpenseRollup.query.delete()
+        db.session.commit()
+        db.session.remove()
+    
+    init_database()
+    
+    with app.app_context():
+        assert ExpenseRollup.verify() == []
+        assert ExpenseRollup.query.count() == 1
+        db.session.remove()
+
+
+def test_summary_views_read_rollups(auth_client, test_user, test_category):
+    """Test the stats endpoint and analytics page reflect rollup totals"""
+    add_expense(test_user, test_category, 'Expense', 10, date.today())
+    add_expense(test_user, test_category, 'Expense', 20, date(2020, 1, 1))
+    
+    stats = auth_client.get('/api/stats/summary').get_json()
+    assert stats['monthly_total'] == 10
+    assert stats['total_expenses'] == 2
+    assert stats['average_expense'] == 15
+    assert stats['top_category'] == 'Test Category'
+    
+    response = auth_client.get('/analytics')
+    assert response.status_code == 200
+    # Decimal totals are embedded as JSON numbers (spacing depends on the encoder)
+    assert re.search(rb'"total": ?30\.0\b', response.data)
+
+
+def test_summary_queries_do_not_scan(auth_client, test_user, test_category, explain_queries):
+    """Test summary queries seek indexes instead of scanning expenses or rollups"""
+    for day in range(1, 11):
+        add_expense(test_user, test_category, 'Expense', day, date(2024, 1, day))
+    
+    def run_summaries():
+        Expense.get_monthly_summary(test_user.id, 2024, 1)
+        Expense.get_yearly_summary(test_user.id, 2024)
+        auth_client.get('/api/stats/summary')
+        auth_client.get('/dashboard')
+    
+    plans = explain_queries(run_summaries)
+    assert plans
+    for statement, plan in plans:
+        for detail in plan:
+            assert not re.match(r'SCAN (expenses|expense_rollups)\b', detail), (statement, detail)
+
+
+def test_summary_stats_cached_until_data_changes(auth_client, test_user, test_category,
+                                                 count_queries):
+    """Test repeated stats loads skip the aggregate until an expense is written"""
+    add_expense(test_user, test_category, 'Expense', 10, date.today())
+    with count_queries() as statements:
+        assert auth_client.get('/api/stats/summary').get_json()['total_expenses'] == 1
+    assert sum('expense_rollups' in statement for statement in statements) == 1
+    
+    with count_queries() as statements:
+        stats = auth_client.get('/api/stats/summary').get_json()
+    assert stats['monthly_total'] == 10
+    assert not any('expense_rollups' in statement for statement in statements)
+    
+    auth_client.post('/api/expenses', json={
+        'title': 'Second',
+        'amount': 30,
+        'category_id': test_category.id,
+        'date': date.today().isoformat()
+    })
+    stats = auth_client.get('/api/stats/summary').get_json()
+    assert stats['total_expenses'] == 2
+    assert stats['monthly_total'] == 40
+    assert stats['average_expense'] == 20
+
+
+def test_bulk_recategorize_and_delete_keep_rollups(test_user, test_category):
+    """Test set-based writes adjust rollups the way ORM writes do"""
+    other = Category(name='Other', color='#28a745')
+    db.session.add(other)
+    db.session.commit()
+    
+    for day in (1, 2, 3):
+        add_expense(test_user, test_category, 'Expense', day, date(2024, 1, day))
+    add_expense(test_user, test_category, 'Expense', 10, date(2024, 2, 1))
+    
+    january = Expense.query.filter(
+        Expense.user_id == test_user.id,
+        Expense.date < date(2024, 2, 1)
+    )
+    assert Expense.bulk_recategorize(january, other.id) == 3
+    db.session.commit()
+    assert ExpenseRollup.verify() == []
+    assert ExpenseRollup.get_summary_stats(test_user.id, 2024, 1)['top_category'] == 'Other'
+    
+    # Rows already in the target category are not counted as moved
+    assert Expense.bulk_recategorize(january, other.id) == 0
+    
+    assert Expense.bulk_delete(january.filter(Expense.amount >= 2)) == 2
+    db.session.commit()
+    assert ExpenseRollup.verify() == []
+    assert ExpenseRollup.get_totals(test_user.id) == (2, 11)
+
+
+def test_delete_account_statement_count_is_constant(app, count_queries):
+    """Test deleting an account issues the same statements for any row count"""
+    category = Category(name='Bulk', color='#000000')
+    db.session.add(category)
+    db.session.commit()
+    
+    def measure(username, expense_count):
+        user = User(username=username, email=f'{username}@example.com', password='Passw0rd1',
+                    first_name='Bulk', last_name='User')
+        db.session.add(user)
+        db.session.commit()
+        for day in range(expense_count):
+            add_expense(user, category, 'Expense', 1, date(2024, 1 + day % 12, 1))
+        
+        with count_queries() as statements:
+            assert User.delete_account(user.id) == expense_count
+            db.session.commit()
+        return len(statements)
+    
+    assert measure('few', 2) == measure('many', 60)
+    assert Expense.query.count() == 0
+    assert ExpenseRollup.query.count() == 0
+    assert User.query.count() == 0
@@ -0,0 +1,137 @@
+"""
+Tests for utility helpers
+"""
+from datetime import date, datetime
+from decimal import Decimal
+import threading
+import pytest
+from flask import jsonify
+from sqlalchemy import event, text
+from app import create_app, db
+from app.models.expense import Expense
+from app.utils.database import engine_options
+from app.utils import json_provider
+from app.utils.group_commit import GroupCommitWriter
+
+
+def test_production_profile_sets_sqlite_pragmas(tmp_path, monkeypatch):
+    """Test the production profile switches file databases to WAL with tuned pragmas"""
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "profile.db"}')
+    monkeypatch.setenv('DATABASE_PROFILE', 'production')
+    app = create_app()
+    
+    with app.app_context():
+        pragma = lambda name: db.session.execute(text(f'PRAGMA {name}')).scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == 5000
+        assert pragma('cache_size') == -65536
+        db.session.remove()
+
+
+def test_production_profile_pool_options():
+    """Test server databases get pool settings and SQLite keeps the defaults"""
+    config = {
+        'DATABASE_PROFILE': 'production',
+        'SQLALCHEMY_DATABASE_URI': 'postgresql://db.example.com/expenses',
+        'DB_POOL_SIZE': 10, 'DB_MAX_OVERFLOW': 20, 'DB_POOL_TIMEOUT': 30, 'DB_POOL_RECYCLE': 1800
+    }
+    options = engine_options(config)
+    assert options['pool_pre_ping'] is True
+    assert (options['pool_size'], options['max_overflow'], options['pool_recycle']) == (10, 20, 1800)
+    
+    assert engine_options({**config, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///app.db'}) == {}
+    assert engine_options({**config, 'DATABASE_PROFILE': 'default'}) == {}
+    with pytest.raises(ValueError):
+        engine_options({**config, 'DATABASE_PROFILE': 'fast'})
+
+
+def test_group_commit_coalesces_writes_and_isolates_failures(app, test_user, test_category):
+    """Test queued writes share commits and a failing write only fails itself"""
+    writer = GroupCommitWriter(app, window=0.2)
+    commits = []
+    event.listen(db.engine, 'commit', lambda conn: commits.append(1))
+    
+    def add(title):
+        expense = Expense(title=title, amount=1, date=date(2024, 1, 1),
+                          user_id=test_user.id, category_id=test_category.id)
+        db.session.add(expense)
+        db.session.flush()
+        return expense.id
+    
+    def fail():
+        raise ValueError('bad write')
+    
+    futures = [writer.submit(lambda i=i: add(f'Expense {i}')) for i in range(5)]
+    failing = writer.submit(fail)
+    results = [future.result(timeout=5) for future in futures]
+    
+    with pytest.raises(ValueError):
+        failing.result(timeout=5)
+    assert len(set(results)) == 5
+    # One failed batch attempt, then each write retried alone
+    assert len(commits) == 5
+    
+    commits.clear()
+    futures = [writer.submit(lambda i=i: add(f'Batch {i}')) for i in range(20)]
+    assert all(future.result(timeout=5) for future in futures)
+    assert len(commits) == 1
+    
+    db.session.expire_all()
+    assert Expense.query.count() == 25
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_json_provider_serializes_dates_and_decimals(app, monkeypatch, use_orjson):
+    """Test dates, datetimes and Decimals serialize the same with and without orjson"""
+    if not use_orjson:
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    elif json_provider.orjson is None:
+        pytest.skip('orjson is not installed')
+    
+    payload = {
+        'date': date(2024, 3, 1),
+        'created_at': datetime(2024, 3, 1, 12, 30, 5, 250000),
+        'amount': Decimal('12.50'),
+        'title': 'Café',
+        'nested': [{'total': Decimal('0.10')}],
+    }
+    expected = {
+        'date': '2024-03-01',
+        'created_at': '2024-03-01T12:30:05.250000',
+        'amount': 12.5,
+        'title': 'Café',
+        'nested': [{'total': 0.1}],
+    }
+    assert app.json.loads(app.json.dumps(payload)) == expected
+    assert list(app.json.loads(app.json.dumps(payload))) == list(payload)
+    
+    with app.test_request_context():
+        response = jsonify(payload)
+    assert response.mimetype == 'application/json'
+    assert response.get_json() == expected
+    
+    with pytest.raises(TypeError):
+        app.json.dumps({'unsupported': object()})
+
+
+def test_group_commit_writer_survives_failures(app, test_user, test_category, monkeypatch):
+    """Test a batch that fails outside the writes fails its futures and the writer carries on"""
+    writer = GroupCommitWriter(app, window=0)
+    commit = writer._commit
+    
+    def broken_commit(batch):
+        monkeypatch.setattr(writer, '_commit', commit)
+        raise RuntimeError('rollback failed')
+    
+    monkeypatch.setattr(writer, '_commit', broken_commit)
+    with pytest.raises(RuntimeError):
+        writer.submit(lambda: 1).result(timeout=5)
+    assert writer.submit(lambda: 2).result(timeout=5) == 2
+    
+    # A writer thread that died anyway is replaced on the next submit
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    writer._thread = dead
+    assert writer.submit(lambda: 3).result(timeout=5) == 3